@@ -1,11 +1,13 @@
-import csv
+import bisect
+import os
+from collections import OrderedDict
 import sys
-from datetime import datetime
+import time
 
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+# Start of the app, used to report the time to first paint
+START_TIME = time.perf_counter()
 
-from PyQt6.QtCore import QDate, Qt
+from PyQt6.QtCore import QDate, QEvent, QFileSystemWatcher, Qt, QTimer
 from PyQt6.QtGui import QColor, QTextCharFormat, QPalette
 from PyQt6.QtWidgets import (
     QApplication,
@@ -22,7 +24,61 @@ from PyQt6.QtWidgets import (
     QHBoxLayout,
     QMessageBox,
     QLineEdit,
+    QFileDialog,
+    QProgressBar,
+    QTableView,
+    QToolTip,
 )
+import numpy as np
+
+from price_store import PriceStore, to_day, to_tuple
+from stock_core import (
+    DATASET_PATH,
+    TradeError,
+    default_trade_dates,
+    snap_trade_dates,
+    string_date_into_tuple,
+    trade_prices,
+)
+from stock_chart import create_chart, export_chart
+from downsample import PyramidCache
+from profit_engine import value_trades, best_trades, top_trades, max_drawdowns
+from data_loader import DataLoader
+from portfolio_dialog import PortfolioDialog
+from analytics import AnalyticsCache, correlation, cumulative_returns
+
+# Inputs of the UI, used to only update what depends on the changed input
+STOCK_CHANGED = "stock"
+DATES_CHANGED = "dates"
+QUANTITY_CHANGED = "quantity"
+THEME_CHANGED = "theme"
+INDICATORS_CHANGED = "indicators"
+ALL_CHANGED = {
+    STOCK_CHANGED,
+    DATES_CHANGED,
+    QUANTITY_CHANGED,
+    THEME_CHANGED,
+    INDICATORS_CHANGED,
+}
+
+# Julian day of 1970-01-01, to convert the numpy days of the store into QDates
+EPOCH_JULIAN_DAY = 2440588
+
+# Number of stocks whose calendar formats and tooltips are kept
+CALENDAR_TABLES = 16
+
+# Indicators that can be drawn over the prices, each one is a list of (label, indicator, window, deviations)
+# lines where deviations is the number of rolling standard deviations added to the indicator
+INDICATORS = {
+    "SMA 20": [("SMA 20", "sma", 20, 0)],
+    "SMA 50": [("SMA 50", "sma", 50, 0)],
+    "SMA 200": [("SMA 200", "sma", 200, 0)],
+    "EMA 20": [("EMA 20", "ema", 20, 0)],
+    "Bollinger Bands 20": [
+        ("Bollinger Upper 20", "sma", 20, 2),
+        ("Bollinger Lower 20", "sma", 20, -2),
+    ],
+}
 
 
 class StockTradeProfitCalculator(QDialog):
@@ -38,58 +94,75 @@ class StockTradeProfitCalculator(QDialog):
     - Displays the profit total
     """
 
-    def __init__(self):
+    def __init__(self, chartBackend="matplotlib"):
         """
         This method requires substantial updates.
         Each of the widgets should be suitably initialized and laid out.
+        chartBackend is the library drawing the graph, "matplotlib" or "pyqtgraph".
         """
         super().__init__()
 
-        # setting up dictionary of Stocks
-        self.data = self.make_data()
-
-        # Check if 'Amazon' exists, if not, handle it gracefully
-        if "Amazon" in self.data:
-            defaultSellDate = sorted(self.data["Amazon"].keys())[-1]
-            defaultBuyDate = sorted(self.data["Amazon"].keys())[-10]
-
-            # transforming tuple to qdate if it exist
-            self.sellCalendarDefaultDate = QDate(
-                defaultSellDate[0], defaultSellDate[1], defaultSellDate[2]
-            )
-            # TODO: Define buyCalendarDefaultDate take at least ten days where we have values
-            self.buyCalendarDefaultDate = QDate(
-                defaultBuyDate[0], defaultBuyDate[1], defaultBuyDate[2]
-            )
-        else:
-            print(
-                "Amazon not found in the dataset. Available stocks:", self.data.keys()
-            )
-            self.sellCalendarDefaultDate = (
-                QDate.currentDate()
-            )  # Default to the current date
-            # TODO: Define buyCalendarDefaultDate take ten days of differences if not references stock
-            self.buyCalendarDefaultDate = self.sellCalendarDefaultDate.addDays(-10)
-            # Adding error message to tell the user if there is no stock available
-            if not self.data.keys():
-                QMessageBox.critical(self, "Error", "No stock available, data error")
+        # Inputs changed since the last update, handled together on the next tick of the event loop
+        self.pendingUpdates = set()
+        self.updateTimer = QTimer(self)
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.setInterval(0)
+        self.updateTimer.timeout.connect(self.flushUpdates)
+
+        # Prices of the current selection, None when the selection is not valid
+        self.buyPrice = None
+        self.sellPrice = None
+
+        # The columnar store of Stocks is loaded on a worker thread once the window is shown (see startLoading)
+        self.data = PriceStore([], [], [])
+        self.dataReady = False
+        self.loader = None
+        self.stockPicked = False  # True once the user chose a stock
+        self.stockNames = (
+            []
+        )  # sorted names of the stock list, read without calls to the combo box
+
+        # The dataset is refreshed when its file changes, the changes of half a second are grouped
+        self.fileWatcher = QFileSystemWatcher(self)
+        self.fileWatcher.fileChanged.connect(self.datasetChanged)
+        self.reloadTimer = QTimer(self)
+        self.reloadTimer.setSingleShot(True)
+        self.reloadTimer.setInterval(500)
+        self.reloadTimer.timeout.connect(self.reloadData)
+        self.firstPaintDone = False
 
         # TODO: create QLabel for Stock selection
         self.stockLabel = QLabel("Select Stock:", self)
 
         # TODO: create QComboBox and populate it with a list of Stocks
         self.stockComboBox = QComboBox(self)
-        # sort stock
-        stortedStock = sorted(self.data.keys())
-        self.stockComboBox.addItems(stortedStock)
 
         # TODO: create CalendarWidgets for selection of purchase and sell dates
         self.buyCalendar = QCalendarWidget(self)
         self.sellCalendar = QCalendarWidget(self)
 
-        # Set default dates for calendars
-        self.buyCalendar.setSelectedDate(self.buyCalendarDefaultDate)
-        self.sellCalendar.setSelectedDate(self.sellCalendarDefaultDate)
+        # (stock, color) the calendars are highlighted for and the months already highlighted on each calendar
+        self.highlightKey = None
+        self.highlightedMonths = {self.buyCalendar: set(), self.sellCalendar: set()}
+
+        # Formats and tooltips of the calendars per (stock, color), the last ones used are kept
+        self.calendarTables = OrderedDict()
+        self.calendarTable = None
+
+        # The tooltip of a calendar day is looked up in calendarTable when it is shown
+        self.calendarViews = {}
+        for calendar in self.highlightedMonths:
+            view = calendar.findChild(QTableView)
+            view.viewport().installEventFilter(self)
+            self.calendarViews[view.viewport()] = calendar
+
+        # Highlight a month when the calendar page is changed
+        self.buyCalendar.currentPageChanged.connect(
+            lambda year, month: self.highlightMonth(self.buyCalendar, year, month)
+        )
+        self.sellCalendar.currentPageChanged.connect(
+            lambda year, month: self.highlightMonth(self.sellCalendar, year, month)
+        )
 
         # Create QLineEdits for date input
         self.buyDateInput = QLineEdit(self)
@@ -122,11 +195,62 @@ class StockTradeProfitCalculator(QDialog):
         self.themeChanger.setFixedSize(90, 20)
         self.themeChanger.setStyleSheet("font-size: 15px; padding: 0px; margin: 0px;")
 
+        # Export button, saves the graph as an image
+        self.exportButton = QPushButton("Export", self)
+        self.exportButton.setFixedSize(90, 20)
+        self.exportButton.setStyleSheet("font-size: 15px; padding: 0px; margin: 0px;")
+        self.exportButton.clicked.connect(self.export_graph)
+
+        # Best trade button, selects the most profitable dates of the stock
+        self.bestTradeButton = QPushButton("Best Trade", self)
+        self.bestTradeButton.setFixedSize(90, 20)
+        self.bestTradeButton.setStyleSheet(
+            "font-size: 15px; padding: 0px; margin: 0px;"
+        )
+        self.bestTradeButton.clicked.connect(self.select_best_trade)
+
+        # Portfolio button, values several positions together in another window
+        self.portfolioButton = QPushButton("Portfolio", self)
+        self.portfolioButton.setFixedSize(90, 20)
+        self.portfolioButton.setStyleSheet(
+            "font-size: 15px; padding: 0px; margin: 0px;"
+        )
+        self.portfolioButton.clicked.connect(self.open_portfolio)
+        self.portfolioDialog = None
+
+        # Indicators button, draws rolling indicators over the prices of the graph
+        self.indicatorsButton = QPushButton("Indicators", self)
+        self.indicatorsButton.setMenu(self.indicators_menu())
+        self.indicatorsButton.setFixedSize(90, 20)
+        self.indicatorsButton.setStyleSheet(
+            "font-size: 15px; padding: 0px; margin: 0px;"
+        )
+
+        # Indicators shown on the graph, computed once per stock and kept in an LRU cache
+        self.shownIndicators = []
+        self.analytics = AnalyticsCache()
+
         # Create a QLabel for the information icon
         self.infoIconLabel = QPushButton("info", self)
         self.infoIconLabel.setFixedSize(90, 20)
         self.infoIconLabel.setStyleSheet("font-size: 15px; padding: 0px; margin: 0px;")
 
+        # Progress of the dataset loading, hidden once the data is ready
+        self.loadingBar = QProgressBar(self)
+        self.loadingBar.setRange(0, 100)
+        self.loadingBar.setFixedSize(180, 20)
+        self.loadingBar.setFormat("Loading data %p%")
+
+        # Cancel button of the dataset loading
+        self.cancelLoadButton = QPushButton("Cancel", self)
+        self.cancelLoadButton.setFixedSize(90, 20)
+        self.cancelLoadButton.setStyleSheet(
+            "font-size: 15px; padding: 0px; margin: 0px;"
+        )
+        self.cancelLoadButton.clicked.connect(self.cancelLoading)
+        self.loadingBar.hide()
+        self.cancelLoadButton.hide()
+
         # Init/Default info text shown on click on infoInconLabel
         self.info_text = (
             "Calendar's Legend:<br>"
@@ -139,6 +263,18 @@ class StockTradeProfitCalculator(QDialog):
             "<br>"
             "Theme Button:<br>"
             "• Permit to change themes<br>"
+            "<br>"
+            "Export Button:<br>"
+            "• Save the graph as an image<br>"
+            "<br>"
+            "Best Trade Button:<br>"
+            "• Select the most profitable buy and sell dates of the stock<br>"
+            "<br>"
+            "Portfolio Button:<br>"
+            "• Value several positions together, the selection is added as a position<br>"
+            "<br>"
+            "Indicators Button:<br>"
+            "• Draw moving averages and Bollinger bands over the graph, show the statistics of the selection<br>"
         )
 
         # Connect the info button's clicked signal to a method
@@ -147,7 +283,14 @@ class StockTradeProfitCalculator(QDialog):
         # Add the info icon label to the frame
         topLayout = QHBoxLayout(self.infoFrame)
         topLayout.addWidget(self.themeChanger)
+        topLayout.addWidget(self.exportButton)
+        topLayout.addWidget(self.bestTradeButton)
+        topLayout.addWidget(self.portfolioButton)
+        topLayout.addWidget(self.indicatorsButton)
         topLayout.addWidget(self.infoIconLabel, alignment=Qt.AlignmentFlag.AlignLeft)
+        topLayout.addWidget(self.loadingBar)
+        topLayout.addWidget(self.cancelLoadButton)
+        topLayout.addStretch()
         topLayout.setContentsMargins(0, 0, 0, 0)
         topLayout.setSpacing(0)
 
@@ -191,9 +334,17 @@ class StockTradeProfitCalculator(QDialog):
         bodyLayout.addWidget(self.sellTotalLabel, 7, 0, 1, 2)
         bodyLayout.addWidget(self.profitTotalLabel, 8, 0, 1, 2)
 
-        # Graph Canvas
-        self.graphCanvas = FigureCanvas(plt.Figure())
-        bodyLayout.addWidget(self.graphCanvas, 0, 2, -1, 2)
+        # Graph Canvas, drawn by the chosen chart backend once the window is shown (see createGraph)
+        self.chartBackend = chartBackend
+        self.chart = None
+        self.graphCanvas = None
+        self.graphData = None  # (stock, buy date, sell date) shown on the graph
+        self.graphPyramids = PyramidCache()  # level of detail of the stocks shown
+        self.graphFrame = QFrame(self)
+        self.graphFrame.setMinimumSize(500, 400)
+        self.graphLayout = QVBoxLayout(self.graphFrame)
+        self.graphLayout.setContentsMargins(0, 0, 0, 0)
+        bodyLayout.addWidget(self.graphFrame, 0, 2, -1, 2)
 
         mainLayout.addLayout(bodyLayout)
 
@@ -202,21 +353,21 @@ class StockTradeProfitCalculator(QDialog):
         # apply default theme (system theme)
         self.apply_theme("System")
 
-        # TODO: set the calendar values
-        # purchase: most recent
-        self.buyCalendar.setSelectedDate(self.buyCalendarDefaultDate)
-        # sell: most recent
-        self.sellCalendar.setSelectedDate(self.sellCalendarDefaultDate)
-
-        # update the buy and sell line with selected date
-        self.update_buy_line_edit()
-        self.update_sell_line_edit()
-
         # TODO: connecting signals to slots so that a change in one control updates the UI
-        self.stockComboBox.currentIndexChanged.connect(self.updateUi)
-        self.buyCalendar.selectionChanged.connect(self.updateUi)
-        self.sellCalendar.selectionChanged.connect(self.updateUi)
-        self.quantitySpinBox.valueChanged.connect(self.updateUi)
+        # Each control only marks the part of the UI depending on it as outdated
+        self.stockComboBox.currentIndexChanged.connect(
+            lambda: self.scheduleUpdate(STOCK_CHANGED)
+        )
+        self.stockComboBox.activated.connect(self.pickStock)
+        self.buyCalendar.selectionChanged.connect(
+            lambda: self.scheduleUpdate(DATES_CHANGED)
+        )
+        self.sellCalendar.selectionChanged.connect(
+            lambda: self.scheduleUpdate(DATES_CHANGED)
+        )
+        self.quantitySpinBox.valueChanged.connect(
+            lambda: self.scheduleUpdate(QUANTITY_CHANGED)
+        )
 
         # Connect QLineEdits to calendar update
         self.buyDateInput.editingFinished.connect(self.update_buy_calendar)
@@ -228,147 +379,356 @@ class StockTradeProfitCalculator(QDialog):
 
         # TODO: set the window title
         self.setWindowTitle("Stock Trade Profit Calculator")
-        # TODO: update the UI
-        self.updateUi()
+        # The UI is updated once, when the data is loaded (see set_data)
 
-    def updateUi(self):
+    def paintEvent(self, event):
         """
-        This requires substantial development.
-        Updates the UI when control values are changed; should also be called when the app initializes.
+        Reports the time to first paint, then creates the graph and loads the data.
         """
-        try:
+        super().paintEvent(event)
+        if not self.firstPaintDone:
+            self.firstPaintDone = True
+            print(f"First paint after {time.perf_counter() - START_TIME:.3f}s.")
+            QTimer.singleShot(0, self.finishStartup)
 
-            # update the calendar to show the AvailableDate in different color
-            self.highlightAvailableDates()
-
-            # TODO: get selected dates, stocks and quantity
-            selected_stock = self.stockComboBox.currentText()
-            buy_date = self.buyCalendar.selectedDate()
-            sell_date = self.sellCalendar.selectedDate()
-            quantity = self.quantitySpinBox.value()
-
-            # Check if buy is before sell
-            if buy_date > sell_date:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Selected buy date is after sell date, impossible calcul",
-                )
-                # Reset the labels
-                self.ResetCalculusLabels()
-                return
+    def finishStartup(self):
+        """
+        Creates the graph and starts loading the data, after the window was painted once.
+        """
+        self.createGraph()
+        self.startLoading()
 
-            # TODO: perform necessary calculations to calculate totals
-            # Convert QDates to tuples for dictionary lookup
-            buy_date_tuple = (buy_date.year(), buy_date.month(), buy_date.day())
-            sell_date_tuple = (sell_date.year(), sell_date.month(), sell_date.day())
+    def createGraph(self):
+        """
+        Creates the chart of the chosen backend, this is where the chart library is imported.
+        """
+        self.chart = create_chart(self.chartBackend)
+        self.graphCanvas = self.chart.widget
+        self.graphLayout.addWidget(self.graphCanvas)
+        self.style_graph()
+        print(f"Graph ready after {time.perf_counter() - START_TIME:.3f}s.")
 
-            # Check if stock is in data
-            if selected_stock not in self.data:
+    def startLoading(self, current=None):
+        """
+        Loads the dataset on a worker thread, a load already running is cancelled.
+        When current is given only the rows added to the file are read, if possible.
+        The current data stays in use until the new one is complete.
+        """
+        self.cancelLoading()
+        loader = DataLoader(DATASET_PATH, current)
+        self.loader = loader
 
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    f"Stock '{selected_stock}' is not available in the dataset.",
-                )
-                # Reset the labels
-                self.ResetCalculusLabels()
-                return
+        # The signals of an older loader are ignored
+        loader.signals.progress.connect(
+            lambda progress: self.showLoadProgress(loader, progress)
+        )
+        loader.signals.stocksFound.connect(
+            lambda stocks: self.addStocks(loader, stocks)
+        )
+        loader.signals.finished.connect(lambda data: self.finishLoading(loader, data))
 
-            # Check if the selected dates are in the data for this stock
-            buy_price = self.data[selected_stock].get(buy_date_tuple, None)
-            sell_price = self.data[selected_stock].get(sell_date_tuple, None)
+        # A refresh only shows its progress if it has to read the whole file
+        self.loadingBar.setValue(0)
+        self.loadingBar.setVisible(current is None)
+        self.cancelLoadButton.setVisible(current is None)
+        loader.start()
 
-            if buy_price is None:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    "The selected purchase date does not match our available data.",
-                )
-                # Reset the labels
-                self.ResetCalculusLabels()
-                return
-            if sell_price is None:
-                QMessageBox.critical(
-                    self,
-                    "Error",
-                    "The selected sell date does not match our available data.",
-                )
-                # Reset the labels
-                self.ResetCalculusLabels()
-                return
+    def datasetChanged(self, path):
+        """
+        Schedules a refresh of the dataset when its file changed.
+        """
+        # The file is no longer watched when it was replaced by a new file
+        if path not in self.fileWatcher.files() and os.path.exists(path):
+            self.fileWatcher.addPath(path)
+        self.reloadTimer.start()
+
+    def reloadData(self):
+        """
+        Refreshes the dataset from its file, keeping the selected stock and dates.
+        """
+        if not self.dataReady:
+            return
+        self.startLoading(self.data)
+
+    def cancelLoading(self):
+        """
+        Cancels the running load, the current data is kept.
+        """
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+        self.loadingBar.hide()
+        self.cancelLoadButton.hide()
+
+    def showLoadProgress(self, loader, progress):
+        """
+        Shows the progress of the running load.
+        """
+        if loader is self.loader:
+            self.loadingBar.setValue(int(progress * 100))
+            self.loadingBar.show()
+            self.cancelLoadButton.show()
+
+    def finishLoading(self, loader, data):
+        """
+        Swaps in the data of the finished load.
+        """
+        if loader is not self.loader:
+            return
+        self.loader = None
+        self.loadingBar.hide()
+        self.cancelLoadButton.hide()
+        if data is not self.data:
+            self.set_data(data)
+
+    def addStocks(self, loader, stocks):
+        """
+        Adds the stocks found by the running load to the stock list, keeping it sorted.
+        """
+        if loader is not self.loader:
+            return
+        self.stockComboBox.blockSignals(True)
+        for stock in stocks:
+            i = bisect.bisect_left(self.stockNames, stock)
+            if i == len(self.stockNames) or self.stockNames[i] != stock:
+                self.stockNames.insert(i, stock)
+                self.stockComboBox.insertItem(i, stock)
+        self.stockComboBox.blockSignals(False)
+
+    def pickStock(self):
+        """
+        Remembers that the user chose a stock, so loading the data does not change it.
+        """
+        self.stockPicked = True
 
-            # Calculate totals
-            purchase_total = buy_price * quantity
-            sell_total = sell_price * quantity
-            profit = sell_total - purchase_total
+    def closeEvent(self, event):
+        self.cancelLoading()
+        super().closeEvent(event)
+
+    def set_data(self, data):
+        """
+        Swaps in a loaded dataset and updates the whole UI.
+        On the first load the default stock and dates are selected, on a reload the selection is kept.
+        """
+        firstLoad = not self.dataReady
+        selectedStock = self.stockComboBox.currentText()
+        self.data = data
+
+        # The calendar formats and the portfolio depend on the data
+        self.highlightKey = None
+        self.calendarTables.clear()
+        if self.portfolioDialog is not None:
+            self.portfolioDialog.set_data(data)
+
+        # sort stock
+        self.stockComboBox.blockSignals(True)
+        self.stockComboBox.clear()
+        self.stockNames = sorted(self.data.tickers)
+        self.stockComboBox.addItems(self.stockNames)
+        if selectedStock in self.data and (self.stockPicked or not firstLoad):
+            self.stockComboBox.setCurrentText(selectedStock)
+        self.stockComboBox.blockSignals(False)
+
+        if firstLoad:
+            self.selectDefaultDates()
+            if os.path.exists(DATASET_PATH):
+                self.fileWatcher.addPath(DATASET_PATH)
+
+        # TODO: update the UI
+        self.dataReady = True
+        self.updateUi()
+        print(f"Data ready after {time.perf_counter() - START_TIME:.3f}s.")
 
-            # TODO: update the label displaying totals
-            # Update the labels with calculated values
-            self.purchaseTotalLabel.setText(f"Purchase Total: ${purchase_total:.2f}")
-            self.sellTotalLabel.setText(f"Sell Total: ${sell_total:.2f}")
-            self.profitTotalLabel.setText(f"Profit: ${profit:.2f}")
+    def selectDefaultDates(self):
+        """
+        Selects the default dates on the calendars, the last ten market days of Amazon.
+        """
+        # Check if 'Amazon' exists, if not, handle it gracefully
+        defaultDates = default_trade_dates(self.data, "Amazon")
+        if defaultDates is not None:
+            defaultBuyDate, defaultSellDate = defaultDates
 
-            # Update graph with selected stock
-            self.plot_stock_history(
-                selected_stock, buy_date_tuple, sell_date_tuple, True
+            # transforming tuple to qdate if it exist
+            self.sellCalendarDefaultDate = QDate(
+                defaultSellDate[0], defaultSellDate[1], defaultSellDate[2]
+            )
+            # TODO: Define buyCalendarDefaultDate take at least ten days where we have values
+            self.buyCalendarDefaultDate = QDate(
+                defaultBuyDate[0], defaultBuyDate[1], defaultBuyDate[2]
             )
+        else:
+            print(
+                "Amazon not found in the dataset. Available stocks:", self.data.tickers
+            )
+            self.sellCalendarDefaultDate = (
+                QDate.currentDate()
+            )  # Default to the current date
+            # TODO: Define buyCalendarDefaultDate take ten days of differences if not references stock
+            self.buyCalendarDefaultDate = self.sellCalendarDefaultDate.addDays(-10)
+            # Adding error message to tell the user if there is no stock available
+            if not self.data.tickers:
+                QMessageBox.critical(self, "Error", "No stock available, data error")
+
+        # TODO: set the calendar values
+        # purchase: most recent
+        self.buyCalendar.setSelectedDate(self.buyCalendarDefaultDate)
+        # sell: most recent
+        self.sellCalendar.setSelectedDate(self.sellCalendarDefaultDate)
+
+        # update the buy and sell line with selected date
+        self.update_buy_line_edit()
+        self.update_sell_line_edit()
+
+    def updateUi(self):
+        """
+        Updates the whole UI at once; called when the app initializes.
+        The controls use scheduleUpdate to only update what depends on them.
+        """
+        self.pendingUpdates |= ALL_CHANGED
+        self.flushUpdates()
+
+    def scheduleUpdate(self, change):
+        """
+        Marks a change of input and schedules the update of the UI.
+        All the changes made during one tick of the event loop are handled by a single flushUpdates.
+        """
+        self.pendingUpdates.add(change)
+        if not self.updateTimer.isActive():
+            self.updateTimer.start()
+
+    def flushUpdates(self):
+        """
+        Updates the parts of the UI depending on the inputs changed since the last update:
+        - stock: everything
+        - dates: the totals and the graph
+        - quantity: the totals only
+        - theme: the calendar highlighting and the graph colors
+        - indicators: the graph only
+        """
+        self.updateTimer.stop()
+        if not self.dataReady:
+            # Kept pending, the whole UI is updated when the data is loaded
+            return
+        changes = self.pendingUpdates
+        self.pendingUpdates = set()
+
+        try:
+            if changes & {STOCK_CHANGED, THEME_CHANGED}:
+                # update the calendar to show the AvailableDate in different color
+                self.highlightAvailableDates()
+            if THEME_CHANGED in changes:
+                self.style_graph()
+
+            if changes & {STOCK_CHANGED, DATES_CHANGED}:
+                self.updatePrices()
+                self.updateTotals()
+                self.updateGraph()
+                return
+
+            if QUANTITY_CHANGED in changes:
+                self.updateTotals()
+            if INDICATORS_CHANGED in changes:
+                self.updateGraph()
 
         except Exception as e:
             print(f"Error in updateUi: {e}")
 
-    def make_data(self):
+    def updatePrices(self):
         """
-        This code reads the stock market CSV file and generates a dictionary structure.
-        :return: a dictionary of dictionaries
+        Looks up the buy and sell prices of the selected stock and dates.
+        Dates without a price are moved to the nearest trading day of the stock.
+        Shows an error and leaves the prices to None when they can not be found.
         """
-        data = {}
+        self.buyPrice = None
+        self.sellPrice = None
+
+        # TODO: get selected dates, stocks and quantity
+        selected_stock = self.stockComboBox.currentText()
+        buy_date = self.buyCalendar.selectedDate()
+        sell_date = self.sellCalendar.selectedDate()
+
+        # Convert QDates to tuples for the price store lookup
+        buy_date_tuple = (buy_date.year(), buy_date.month(), buy_date.day())
+        sell_date_tuple = (sell_date.year(), sell_date.month(), sell_date.day())
+
+        # Snap the dates to trading days and show them on the calendars
+        buy_date_tuple, sell_date_tuple = snap_trade_dates(
+            self.data, selected_stock, buy_date_tuple, sell_date_tuple
+        )
+        self.selectDates(buy_date_tuple, sell_date_tuple)
+
+        # Check the order of the dates and that the stock has a value on both
         try:
-            with open("Transformed_Stock_Market_Dataset.csv", mode="r") as file:
-                reader = csv.DictReader(file)
-                stock_names = reader.fieldnames[
-                    1:
-                ]  # All columns except 'Date' are stock names
+            self.buyPrice, self.sellPrice = trade_prices(
+                self.data, selected_stock, buy_date_tuple, sell_date_tuple
+            )
+        except TradeError as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+
+        self.buyDateTuple = buy_date_tuple
+        self.sellDateTuple = sell_date_tuple
 
-                for row in reader:
-                    date_string = row["Date"]
-                    date_tuple = self.string_date_into_tuple(date_string)
+    def selectDates(self, buy_date_tuple, sell_date_tuple):
+        """
+        Selects dates on the calendars without scheduling another update, the date inputs follow.
+        """
+        for calendar, date_tuple in (
+            (self.buyCalendar, buy_date_tuple),
+            (self.sellCalendar, sell_date_tuple),
+        ):
+            if calendar.selectedDate() != QDate(*date_tuple):
+                calendar.blockSignals(True)
+                calendar.setSelectedDate(QDate(*date_tuple))
+                calendar.blockSignals(False)
+                self.highlightMonth(
+                    calendar, calendar.yearShown(), calendar.monthShown()
+                )
+        self.update_buy_line_edit()
+        self.update_sell_line_edit()
 
-                    for stock in stock_names:
-                        price = row[stock].replace(",", "")
-                        try:
-                            price = float(price)
-                        except ValueError:
-                            price = 0.0
+    def updateTotals(self):
+        """
+        Updates the purchase, sell and profit labels from the prices and the quantity.
+        """
+        if self.buyPrice is None or self.sellPrice is None:
+            # Reset the labels
+            self.ResetCalculusLabels()
+            return
 
-                        if stock not in data:
-                            data[stock] = {}
+        # TODO: perform necessary calculations to calculate totals
+        quantity = self.quantitySpinBox.value()
+        purchase_total, sell_total, profit = value_trades(
+            self.buyPrice, self.sellPrice, quantity
+        )
 
-                        data[stock][date_tuple] = price
+        # TODO: update the label displaying totals
+        # Update the labels with calculated values
+        self.purchaseTotalLabel.setText(f"Purchase Total: ${purchase_total:.2f}")
+        self.sellTotalLabel.setText(f"Sell Total: ${sell_total:.2f}")
+        self.profitTotalLabel.setText(f"Profit: ${profit:.2f}")
 
-            print("Data loaded successfully.")
-            print(
-                f"Stocks available: {stock_names}"
-            )  # Debugging: Print all available stock names
+    def updateGraph(self):
+        """
+        Plots the selected stock between the buy and sell dates when the prices are valid.
+        """
+        if self.buyPrice is None or self.sellPrice is None:
+            return
 
-        except Exception as e:
-            print(f"Error reading data: {e}")
-        return data
+        # Update graph with selected stock
+        self.plot_stock_history(
+            self.stockComboBox.currentText(),
+            self.buyDateTuple,
+            self.sellDateTuple,
+            True,
+        )
 
     def string_date_into_tuple(self, date_string):
         """
         Converts a date in string format (e.g., "2024-02-02") into a tuple (year, month, day).
         :return: tuple representing the date
         """
-        try:
-            if "-" in date_string:
-                date_obj = datetime.strptime(date_string, "%d-%m-%Y")
-            else:
-                date_obj = datetime.strptime(date_string, "%m/%d/%Y")
-            return date_obj.year, date_obj.month, date_obj.day
-        except ValueError:
-            print(f"Error parsing date: {date_string}")
-            return None
+        return string_date_into_tuple(date_string)
 
     def update_buy_calendar(self):
         """
@@ -410,59 +770,171 @@ class StockTradeProfitCalculator(QDialog):
     def highlightAvailableDates(self):
         """
         Highlights dates in the buy and sell calendars where data for the selected stock is available.
-        Adds tooltips with stock prices and dims unavailable dates. Disables dates outside the range of available data.
+        Dims unavailable dates and disables dates outside the range of available data, the tooltips
+        with the stock prices are shown by eventFilter.
+        Only the displayed month of each calendar is formatted, the other months are done when they are shown.
+        Nothing is done when the stock and the theme did not change since the last call.
         """
-        # Clear previous highlights and tooltips
-        self.buyCalendar.setDateTextFormat(QDate(), QTextCharFormat())
-        self.sellCalendar.setDateTextFormat(QDate(), QTextCharFormat())
-
         # Get selected stock
         selected_stock = self.stockComboBox.currentText()
-        if selected_stock not in self.data:
-            return
 
         # Get the application's selection color and make it darker
         selection_color = self.palette().color(self.palette().ColorRole.Highlight)
         darker_selection_color = selection_color.darker(150)  # Adjust darkness level
 
-        # Define formats using the darker selection color
-        available_format = QTextCharFormat()
-        available_format.setBackground(
-            darker_selection_color
-        )  # Darker selection color for available dates
+        key = (selected_stock, darker_selection_color.name())
+        if key != self.highlightKey:
+            # Clear previous highlights
+            self.highlightKey = key
+            for calendar, months in self.highlightedMonths.items():
+                calendar.setDateTextFormat(QDate(), QTextCharFormat())
+                months.clear()
+
+            if selected_stock not in self.data:
+                self.calendarTable = None
+                return
+            self.calendarTable = self.calendarTableOf(
+                selected_stock, darker_selection_color
+            )
+
+            # Get the range of available dates for the selected stock
+            min_date_tuple = self.data.min_date(selected_stock)
+            max_date_tuple = self.data.max_date(selected_stock)
+            if min_date_tuple is None:
+                return
 
-        unavailable_format = QTextCharFormat()
-        unavailable_format.setForeground(
-            QColor("#A9A9A9")
-        )  # Gray for unavailable dates
+            # Set calendar date range to disable dates outside of available data
+            for calendar in self.highlightedMonths:
+                calendar.setMinimumDate(QDate(*min_date_tuple))
+                calendar.setMaximumDate(QDate(*max_date_tuple))
 
-        # Get all available dates for the selected stock
-        stock_dates = self.data[selected_stock].keys()
-        min_date_tuple = min(stock_dates)
-        max_date_tuple = max(stock_dates)
-        min_date = QDate(*min_date_tuple)
-        max_date = QDate(*max_date_tuple)
+        # Highlight the displayed month of both calendars
+        for calendar in self.highlightedMonths:
+            self.highlightMonth(calendar, calendar.yearShown(), calendar.monthShown())
 
-        # Set calendar date range to disable dates outside of available data
-        self.buyCalendar.setMinimumDate(min_date)
-        self.buyCalendar.setMaximumDate(max_date)
-        self.sellCalendar.setMinimumDate(min_date)
-        self.sellCalendar.setMaximumDate(max_date)
+    def highlightMonth(self, calendar, year, month):
+        """
+        Applies the highlighting and dimming of highlightAvailableDates to one month of a calendar.
+        The days of the previous and next months visible on the page are included.
+        """
+        selected_stock = self.stockComboBox.currentText()
+        months = self.highlightedMonths[calendar]
+        if (year, month) in months or selected_stock not in self.data:
+            return
+        if (
+            self.highlightKey is None
+            or self.highlightKey[0] != selected_stock
+            or self.calendarTable is None
+        ):
+            # The formats of this stock are not ready, highlightAvailableDates will do the month
+            return
+        months.add((year, month))
+
+        # Days shown on the page, clipped to the range of available data
+        first_day = QDate(year, month, 1)
+        start_date = max(first_day.addDays(-7), calendar.minimumDate())
+        end_date = min(first_day.addDays(42), calendar.maximumDate())
+        if start_date > end_date:
+            return
+
+        # Trading days of the page from the bitmap of the stock
+        start_tuple = (start_date.year(), start_date.month(), start_date.day())
+        end_tuple = (end_date.year(), end_date.month(), end_date.day())
+        days = np.arange(to_day(start_tuple), to_day(end_tuple) + 1)
+        available = self.data.date_index(selected_stock).contains(days)
 
         # Apply highlighting for available dates and dimming for unavailable dates
-        for date in self.iterate_dates(min_date, max_date):
-            date_tuple = (date.year(), date.month(), date.day())
-            if date_tuple in stock_dates:
-                # Highlight available dates and set tooltip with stock price
-                self.buyCalendar.setDateTextFormat(date, available_format)
-                self.sellCalendar.setDateTextFormat(date, available_format)
-                price = self.data[selected_stock][date_tuple]
-                self.buyCalendar.setToolTip(f"{date.toString()} - Price: ${price:.2f}")
-                self.sellCalendar.setToolTip(f"{date.toString()} - Price: ${price:.2f}")
-            else:
-                # Dim unavailable dates within the range
-                self.buyCalendar.setDateTextFormat(date, unavailable_format)
-                self.sellCalendar.setDateTextFormat(date, unavailable_format)
+        availableFormat, unavailableFormat, _ = self.calendarTable
+        for date, is_available in zip(
+            self.iterate_dates(start_date, end_date), available.tolist()
+        ):
+            calendar.setDateTextFormat(
+                date, availableFormat if is_available else unavailableFormat
+            )
+
+    def calendarTableOf(self, stock, color):
+        """
+        Gets the calendar formats and the tooltips of a stock, computed once per stock and color.
+        The tables of another color are dropped, the theme changed.
+        :return: (available format, unavailable format, tooltips by julian day)
+        """
+        key = (stock, color.name())
+        if key in self.calendarTables:
+            self.calendarTables.move_to_end(key)
+            return self.calendarTables[key]
+        for other in [other for other in self.calendarTables if other[1] != key[1]]:
+            del self.calendarTables[other]
+
+        # Define formats using the darker selection color
+        availableFormat = QTextCharFormat()
+        availableFormat.setBackground(
+            color
+        )  # Darker selection color for available dates
+        unavailableFormat = QTextCharFormat()
+        unavailableFormat.setForeground(QColor("#A9A9A9"))  # Gray for unavailable dates
+
+        # Tooltip with the stock price of every available date
+        dates, prices = self.data.history(stock)
+        julian_days = dates.astype(np.int64) + EPOCH_JULIAN_DAY
+        tooltips = {
+            day: f"{QDate.fromJulianDay(day).toString()} - Price: ${price:.2f}"
+            for day, price in zip(julian_days.tolist(), prices.tolist())
+        }
+
+        self.calendarTables[key] = (availableFormat, unavailableFormat, tooltips)
+        while len(self.calendarTables) > CALENDAR_TABLES:
+            self.calendarTables.popitem(last=False)
+        return self.calendarTables[key]
+
+    def eventFilter(self, watched, event):
+        """
+        Shows the tooltip of the calendar day under the mouse, with the price of the stock on that day.
+        """
+        if event.type() != QEvent.Type.ToolTip or watched not in self.calendarViews:
+            return super().eventFilter(watched, event)
+        calendar = self.calendarViews[watched]
+        date = self.calendarDateAt(calendar, event.pos())
+        tooltip = None
+        if date is not None and self.calendarTable is not None:
+            tooltip = self.calendarTable[2].get(date.toJulianDay())
+        if tooltip is None:
+            QToolTip.hideText()
+            event.ignore()
+        else:
+            QToolTip.showText(event.globalPos(), tooltip, watched)
+        return True
+
+    def calendarDateAt(self, calendar, pos):
+        """
+        Finds the date of the calendar cell at a position of its view.
+        The cells only hold the day number, the month is found from the row of the cell.
+        :return: the QDate or None outside of the days
+        """
+        view = calendar.findChild(QTableView)
+        index = view.indexAt(pos)
+
+        # The headers of the days and of the week numbers are the first row and column of the view
+        row, column = index.row(), index.column()
+        if (
+            calendar.horizontalHeaderFormat()
+            != QCalendarWidget.HorizontalHeaderFormat.NoHorizontalHeader
+        ):
+            row -= 1
+        if (
+            calendar.verticalHeaderFormat()
+            != QCalendarWidget.VerticalHeaderFormat.NoVerticalHeader
+        ):
+            column -= 1
+        if not index.isValid() or row < 0 or column < 0:
+            return None
+
+        day = int(index.data())
+        date = QDate(calendar.yearShown(), calendar.monthShown(), 1)
+        if row == 0 and day > 20:
+            date = date.addMonths(-1)  # day of the previous month on the first row
+        elif row >= 4 and day < 15:
+            date = date.addMonths(1)  # day of the next month on the last rows
+        return QDate(date.year(), date.month(), day)
 
     def iterate_dates(self, start_date, end_date):
         """
@@ -563,6 +1035,7 @@ class StockTradeProfitCalculator(QDialog):
 
         # Update the menu style using setStyleSheet
         self.themeChanger.menu().setStyleSheet(menu_style)
+        self.indicatorsButton.menu().setStyleSheet(menu_style)
 
         # Update the tooltip with color cubes based on the selected theme
         self.info_text = (
@@ -576,87 +1049,263 @@ class StockTradeProfitCalculator(QDialog):
             "Theme Button:<br>"
             "• Permit to change themes<br>"
             "<br>"
+            "Export Button:<br>"
+            "• Save the graph as an image<br>"
+            "<br>"
+            "Best Trade Button:<br>"
+            "• Select the most profitable buy and sell dates of the stock<br>"
+            "<br>"
+            "Portfolio Button:<br>"
+            "• Value several positions together, the selection is added as a position<br>"
+            "<br>"
+            "Indicators Button:<br>"
+            "• Draw moving averages and Bollinger bands over the graph, show the statistics of the selection<br>"
+            "<br>"
         )
 
         # Update the info frame background color
         self.infoFrame.setStyleSheet(f"background-color: {info_frame_color};")
 
-        # Update ui
-        self.updateUi()
-
-    # Method to display information
-    def show_info(self):
-        QMessageBox.information(self, "Info", self.info_text)
+        # Restyle the calendars and the graph
+        self.scheduleUpdate(THEME_CHANGED)
 
-    def plot_stock_history(
-        self, stock_name, buy_date_tuple, sell_date_tuple, updateui=False
-    ):
+    def select_best_trade(self):
         """
-        Plots the historical price data for the selected stock with a specific timeframe.
+        Selects on the calendars the most profitable buy and sell dates of the selected stock
+        and shows the best trades and the max drawdown over its whole history.
         """
-        # Clear the previous plot
-        self.graphCanvas.figure.clf()
-        ax = self.graphCanvas.figure.add_subplot(111)
+        stock = self.stockComboBox.currentText()
+        if stock not in self.data:
+            return
+        dates, prices, mask = self.data.window(stock)
+        (buy,), (sell,), _ = best_trades(prices, mask)
+        if buy < 0:
+            return
+
+        # Selecting the dates updates the totals and the graph
+        buy_date, sell_date = to_tuple(dates[buy]), to_tuple(dates[sell])
+        self.buyCalendar.setSelectedDate(QDate(*buy_date))
+        self.sellCalendar.setSelectedDate(QDate(*sell_date))
+        self.update_buy_line_edit()
+        self.update_sell_line_edit()
 
-        # Get the stock data and sort it by date
-        stock_dates = sorted(self.data[stock_name].keys())
-        filtered_dates = [
-            date for date in stock_dates if buy_date_tuple <= date <= sell_date_tuple
+        lines = [
+            f"{dates[i]} → {dates[j]}: ${gain:.2f}"
+            for i, j, gain in top_trades(prices, mask)
         ]
-        prices = [self.data[stock_name][date] for date in filtered_dates]
+        (peak,), (trough,), (drawdown,) = max_drawdowns(prices, mask)
+        QMessageBox.information(
+            self,
+            "Best Trade",
+            f"Best trades of {stock} for one share:<br>"
+            + "<br>".join(lines)
+            + f"<br><br>Max drawdown: {drawdown:.1%} ({dates[peak]} → {dates[trough]})",
+        )
 
-        # Convert dates to formatted strings for the x-axis
-        date_strings = [f"{d[2]}-{d[1]}-{d[0]}" for d in filtered_dates]
+    def open_portfolio(self):
+        """
+        Opens the portfolio window and adds the current selection as a position.
+        """
+        if not self.dataReady:
+            return
+        if self.portfolioDialog is None:
+            self.portfolioDialog = PortfolioDialog(self.data, self.chartBackend, self)
+            self.portfolioDialog.addButton.clicked.connect(self.add_portfolio_position)
+            self.portfolioDialog.chart.style(*self.graph_colors())
+        self.add_portfolio_position()
+        self.portfolioDialog.show()
+        self.portfolioDialog.raise_()
+
+    def add_portfolio_position(self):
+        """
+        Adds the selected stock, quantity and dates as a position of the portfolio.
+        """
+        self.portfolioDialog.addPosition(
+            self.stockComboBox.currentText(),
+            self.quantitySpinBox.value(),
+            self.buyCalendar.selectedDate(),
+            self.sellCalendar.selectedDate(),
+        )
 
-        title = f"{stock_name} Price History - Last {len(filtered_dates)} market days"
+    def indicators_menu(self):
+        """
+        :return: menu of the indicators, each one can be checked to be drawn on the graph
+        """
+        menu = QMenu(self)
+        for name in INDICATORS:
+            action = menu.addAction(name)
+            action.setCheckable(True)
+            action.toggled.connect(
+                lambda checked, name=name: self.toggle_indicator(name, checked)
+            )
+        menu.addSeparator()
+        action_statistics = menu.addAction("Statistics")
+        action_statistics.triggered.connect(self.show_statistics)
+        return menu
 
-        # Get color theme
-        background = self.palette().color(self.palette().ColorRole.Window).name()
-        text = self.palette().color(self.palette().ColorRole.WindowText).name()
-        graph_color = self.palette().color(self.palette().ColorRole.Highlight).name()
+    def toggle_indicator(self, name, checked):
+        """
+        Shows or hides an indicator on the graph.
+        """
+        if checked and name not in self.shownIndicators:
+            self.shownIndicators.append(name)
+        elif not checked and name in self.shownIndicators:
+            self.shownIndicators.remove(name)
+        self.scheduleUpdate(INDICATORS_CHANGED)
 
-        # Set background color
-        ax.set_facecolor(background)
-        self.graphCanvas.figure.patch.set_facecolor(background)
+    def indicator_overlays(self, stock_name, buy_date_tuple, sell_date_tuple):
+        """
+        Gets the shown indicators of a stock between two dates (inclusive).
+        The indicators are computed over the whole history of the stock, so the first values of the
+        window are not missing, and only sliced here.
+        :return: list of (label, dates, values, positions) where positions is the market day index in the window
+        """
+        overlays = []
+        for name in self.shownIndicators:
+            for label, indicator, window, deviations in INDICATORS[name]:
+                dates, values = self.analytics.indicator(
+                    self.data, stock_name, indicator, window
+                )
+                start = np.searchsorted(dates, to_day(buy_date_tuple), side="left")
+                end = np.searchsorted(dates, to_day(sell_date_tuple), side="right")
+                values = values[start:end]
+                if deviations:
+                    _, std = self.analytics.indicator(
+                        self.data, stock_name, "std", window
+                    )
+                    values = values + deviations * std[start:end]
+                overlays.append(
+                    (label, dates[start:end], values, np.arange(end - start))
+                )
+        return overlays
 
-        # Set box (spines) color
-        for spine in ax.spines.values():
-            spine.set_color(text)
+    def show_statistics(self):
+        """
+        Shows the volatility and the return of the selected stock between the buy and sell dates,
+        and its correlation with the other stocks over the same dates.
+        """
+        if self.graphData is None:
+            QMessageBox.information(self, "Statistics", "There is no selection.")
+            return
+        stock, buy_date_tuple, sell_date_tuple = self.graphData
+        dates, prices = self.data.history(stock, buy_date_tuple, sell_date_tuple)
+        if not len(prices):
+            return
 
-        # Plot the complete data
-        ax.plot(date_strings, prices, label=stock_name, color=graph_color)
-        ax.set_title(title, color=text)
-        ax.set_xlabel("Date", color=text)
-        ax.set_ylabel("Price ($)", color=text)
+        # The volatility at the sell date, over the 20 market days before it
+        volatility_dates, volatilities = self.analytics.indicator(
+            self.data, stock, "volatility", 20
+        )
+        sell = np.searchsorted(volatility_dates, dates[-1])
+        lines = [
+            f"Return: {cumulative_returns(prices)[-1]:.2%}",
+            f"Volatility (20 days, annualized): {volatilities[sell]:.2%}",
+        ]
 
-        # Set x-axis tick labels to show only around 10 dates
-        if len(date_strings) > 10:
-            step = len(date_strings) // 10
-            ax.set_xticks(range(0, len(date_strings), step))
+        others = [ticker for ticker in self.data.tickers if ticker != stock]
+        matrix = correlation(
+            self.data, [stock] + others, buy_date_tuple, sell_date_tuple
+        )
+        lines.append("<br>Correlation of the daily returns:")
+        lines += [
+            f"{other}: {value:.2f}"
+            for other, value in zip(others, np.atleast_2d(matrix)[0, 1:])
+        ]
+        QMessageBox.information(
+            self,
+            "Statistics",
+            f"{stock} from {dates[0]} to {dates[-1]}:<br>" + "<br>".join(lines),
+        )
 
-        # Set x-axis tick label colors
-        ax.tick_params(axis="x", rotation=45, colors=text)
-        ax.tick_params(axis="y", colors=text)
+    # Method to display information
+    def show_info(self):
+        QMessageBox.information(self, "Info", self.info_text)
 
-        # Adjust the layout to minimize space at the top
-        self.graphCanvas.figure.subplots_adjust(
-            top=0.9, bottom=0.2, left=0.15, right=0.9
-        )
+    def graph_colors(self):
+        """
+        :return: (background, text, line) colors of the graph for the current theme
+        """
+        background = self.palette().color(self.palette().ColorRole.Window).name()
+        text = self.palette().color(self.palette().ColorRole.WindowText).name()
+        graph_color = self.palette().color(self.palette().ColorRole.Highlight).name()
+        return background, text, graph_color
 
-        # Render the canvas
-        self.graphCanvas.draw()
+    def style_graph(self):
+        """
+        Applies the colors of the current theme to the graph and to the portfolio graph.
+        """
+        self.chart.style(*self.graph_colors())
+        if self.portfolioDialog is not None:
+            self.portfolioDialog.chart.style(*self.graph_colors())
 
-        if updateui == False:
-            # Adjust figure size to match the window size if not updating ui
-            self.graphCanvas.figure.set_size_inches(
-                self.graphCanvas.width() / self.graphCanvas.devicePixelRatio(),
-                self.graphCanvas.height() / self.graphCanvas.devicePixelRatio(),
+    def plot_stock_history(
+        self, stock_name, buy_date_tuple, sell_date_tuple, updateui=False
+    ):
+        """
+        Plots the historical price data for the selected stock with a specific timeframe.
+        """
+        self.graphData = (stock_name, buy_date_tuple, sell_date_tuple)
+        positions = None
+        if self.chart.autoDownsampling:
+            # Get the stock data between the two dates, already sorted by date
+            filtered_dates, prices = self.data.history(
+                stock_name, buy_date_tuple, sell_date_tuple
+            )
+        else:
+            # Reduce the stock data to about two points per pixel of the graph
+            width = self.graphCanvas.width() * self.graphCanvas.devicePixelRatio()
+            filtered_dates, prices, positions = self.graphPyramids.window(
+                self.data,
+                stock_name,
+                buy_date_tuple,
+                sell_date_tuple,
+                max(int(width) * 2, 200),
             )
 
+        overlays = self.indicator_overlays(stock_name, buy_date_tuple, sell_date_tuple)
+        if positions is not None and len(positions):
+            # Keep about as many points of the indicators as of the prices
+            step = max((positions[-1] + 1) // len(positions), 1)
+            overlays = [
+                (label, dates[::step], values[::step], overlay_positions[::step])
+                for label, dates, values, overlay_positions in overlays
+            ]
+
+        # Adjust figure size to match the window size if not updating ui
+        self.chart.plot(
+            stock_name,
+            filtered_dates,
+            prices,
+            positions,
+            resize=not updateui,
+            overlays=overlays,
+        )
+
+    def export_graph(self):
+        """
+        Saves the graph as an image, always rendered with matplotlib.
+        """
+        if self.graphData is None:
+            QMessageBox.information(self, "Export", "There is no graph to export.")
+            return
+        filePath, _ = QFileDialog.getSaveFileName(
+            self, "Export Graph", "", "PNG(*.png);;PDF(*.pdf);;SVG(*.svg)"
+        )
+        if filePath == "":  # if the file path is empty
+            return
+        stock_name, buy_date_tuple, sell_date_tuple = self.graphData
+        filtered_dates, prices = self.data.history(
+            stock_name, buy_date_tuple, sell_date_tuple
+        )
+        export_chart(filePath, stock_name, filtered_dates, prices, self.graph_colors())
+
 
 # This is complete
 if __name__ == "__main__":
     app = QApplication(sys.argv)
-    stock_calculator = StockTradeProfitCalculator()
+    # the graph library can be chosen with STOCK_CHART=matplotlib or STOCK_CHART=pyqtgraph
+    stock_calculator = StockTradeProfitCalculator(
+        os.environ.get("STOCK_CHART", "matplotlib")
+    )
     stock_calculator.show()
     sys.exit(app.exec())
@@ -0,0 +1,214 @@
+"""
+Rolling analytics of the stock prices: moving averages, volatility, returns and correlation.
+
+The rolling statistics are computed in O(n) from cumulative sums, the
+exponential average in one pass. A missing or non-finite value (the log return
+of a negative price) only makes the windows containing it NaN: the sums are
+taken over the values set to 0 with a count of the finite values of each window.
+Results are kept in an LRU cache per (stock, indicator, window); when the
+dataset only gained new days at its end, the cached values are kept and only
+the new days are computed from the tail of the series.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+# Market days in a year, used to annualize the volatility
+TRADING_DAYS = 252
+
+
+def window_sums(values, window, power=1):
+    """
+    Sums of the finite values raised to power over each window of window values.
+    :return: (sums, counts of the finite values) arrays of length len(values) - window + 1
+    """
+    finite = np.isfinite(values)
+    sums = np.cumsum(np.concatenate(([0.0], np.where(finite, values, 0.0) ** power)))
+    counts = np.cumsum(np.concatenate(([0], finite)))
+    return sums[window:] - sums[:-window], counts[window:] - counts[:-window]
+
+
+def moving_average(prices, window):
+    """
+    Simple moving average over window values.
+    :return: float64 array of the length of prices, NaN for the first window - 1 values
+             and for the windows with a value that is not finite
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    values = np.full(len(prices), np.nan)
+    if 0 < window <= len(prices):
+        total, counts = window_sums(prices, window)
+        values[window - 1 :] = np.where(counts == window, total / window, np.nan)
+    return values
+
+
+def rolling_std(prices, window):
+    """
+    Sample standard deviation over window values.
+    :return: float64 array of the length of prices, NaN for the first window - 1 values
+             and for the windows with a value that is not finite
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    values = np.full(len(prices), np.nan)
+    if 1 < window <= len(prices):
+        # Centered on the first finite value so the sums of squares do not lose precision
+        finite = prices[np.isfinite(prices)]
+        centered = prices - (finite[0] if len(finite) else 0.0)
+        total, counts = window_sums(centered, window)
+        total_squares, _ = window_sums(centered, window, 2)
+        variance = (total_squares - total**2 / window) / (window - 1)
+        values[window - 1 :] = np.where(
+            counts == window, np.sqrt(np.maximum(variance, 0.0)), np.nan
+        )
+    return values
+
+
+def exponential_average(prices, span, initial=None):
+    """
+    Exponential moving average with a smoothing factor of 2 / (span + 1).
+    initial is the average before the first price, to continue a series already computed.
+    :return: float64 array of the length of prices
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    alpha = 2.0 / (span + 1)
+    values = np.empty(len(prices))
+    average = initial
+    for i, price in enumerate(prices.tolist()):
+        average = price if average is None else average + alpha * (price - average)
+        values[i] = average
+    return values
+
+
+def log_returns(prices):
+    """
+    :return: logarithm of the ratio of each price to the previous one, NaN for the first price
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    returns = np.full(len(prices), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns[1:] = np.diff(np.log(prices))
+    return returns
+
+
+def cumulative_returns(prices):
+    """
+    :return: return of each price since the first price, as a fraction
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    return prices / prices[0] - 1 if len(prices) else prices
+
+
+def volatility(prices, window, periods=TRADING_DAYS):
+    """
+    Annualized volatility, the standard deviation of the log returns over window returns.
+    :return: float64 array of the length of prices, NaN until window returns are known and
+             for the windows with the return of a price that is not positive
+
+    The prices after a negative price get a volatility again once it left the window:
+
+    >>> prices = [10, 11, 12, -5, 12, 13, 14, 15, 16]
+    >>> np.isnan(volatility(prices, 2)).tolist()
+    [True, True, False, True, True, True, False, False, False]
+    """
+    returns = log_returns(prices)
+    values = np.full(len(returns), np.nan)
+    values[1:] = rolling_std(returns[1:], window) * np.sqrt(periods)
+    return values
+
+
+def correlation(store, stocks, start_tuple=None, end_tuple=None):
+    """
+    Correlation of the daily log returns of stocks, over the dates where every stock has a price.
+    Each pair is correlated over the returns finite for both stocks, so the return of a negative
+    price is left out; a pair with fewer than 2 such returns is NaN.
+    :return: matrix of shape (stocks, stocks)
+    """
+    rows = []
+    masks = []
+    for stock in stocks:
+        _, prices, mask = store.window(stock, start_tuple, end_tuple)
+        rows.append(prices)
+        masks.append(mask)
+    common = np.logical_and.reduce(masks) if masks else np.array([], dtype=bool)
+    prices = np.array([row[common] for row in rows])
+    matrix = np.full((len(stocks), len(stocks)), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(prices), axis=1) if len(stocks) else prices
+        finite = np.isfinite(returns)
+        for i in range(len(stocks)):
+            for j in range(i, len(stocks)):
+                both = finite[i] & finite[j]
+                if both.sum() >= 2:
+                    pair = np.corrcoef(returns[i, both], returns[j, both])
+                    matrix[i, j] = matrix[j, i] = pair[0, 1]
+    return matrix
+
+
+# Indicators of the cache, with the number of previous prices needed to compute a new value
+INDICATORS = {
+    "sma": (moving_average, lambda window: window - 1),
+    "std": (rolling_std, lambda window: window - 1),
+    "volatility": (volatility, lambda window: window),
+    "log_returns": (lambda prices, window: log_returns(prices), lambda window: 1),
+}
+
+
+def extend_indicator(name, prices, window, values):
+    """
+    Computes the values of an indicator for the prices added after the values already known.
+    :return: the values for every price
+    """
+    start = len(values)
+    if name == "ema":
+        tail = exponential_average(
+            prices[start:], window, values[-1] if start else None
+        )
+    elif name == "cumulative_returns":
+        tail = prices[start:] / prices[0] - 1 if len(prices) else prices
+    else:
+        function, lookback = INDICATORS[name]
+        first = max(start - lookback(window), 0)
+        tail = function(prices[first:], window)[start - first :]
+    return np.concatenate((values, tail))
+
+
+class AnalyticsCache:
+    """
+    LRU cache of the indicators of the stocks, keyed by (stock, indicator, window).
+    An entry remembers the store and the dates it was computed for, so an entry of an older
+    store holding the first dates of the new one is only extended with the new days.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def indicator(self, store, stock, name, window=0):
+        """
+        Gets an indicator over the available prices of a stock.
+        name is one of "sma", "ema", "std", "volatility", "log_returns" and "cumulative_returns".
+        :return: (dates, values) arrays
+        """
+        key = (stock, name, window)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            if entry[0] is store:
+                return entry[1], entry[2]
+
+        dates, prices = store.history(stock)
+        values = np.array([])
+        if entry is not None:
+            _, cached_dates, cached_values = entry
+            if len(cached_dates) <= len(dates) and np.array_equal(
+                dates[: len(cached_dates)], cached_dates
+            ):
+                values = cached_values
+        values = extend_indicator(name, prices, window, values)
+
+        self.entries[key] = (store, dates, values)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return dates, values
@@ -0,0 +1,3 @@
+"""
+Benchmarks of the stock calculator, run with "python -m benchmarks.run" from the project folder.
+"""
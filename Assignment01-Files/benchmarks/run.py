@@ -0,0 +1,305 @@
+"""
+Benchmark suite of the stock calculator.
+
+Measures the ingestion throughput of synthetic CSV files from 1k to 10M cells,
+the latency of the calendar highlighting and of the graph, and the latency of
+an update of the UI for each kind of input. The UI runs offscreen. Results are
+written as JSON and can be compared with a baseline saved by an earlier run.
+
+Usage, from the project folder:
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# The UI benchmarks never show a window
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_generator import TICKERS, generate_dataset  # noqa: E402
+from price_cache import cache_dir  # noqa: E402
+from stock_core import DATASET_PATH, load_dataset  # noqa: E402
+
+# Sizes of the ingestion benchmarks, in price cells
+INGEST_SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+QUICK_SIZES = [1_000, 10_000, 100_000]
+
+# Size of the dataset the UI benchmarks run on
+UI_CELLS = 100_000
+
+# Days of a synthetic dataset are kept under this, the larger ones get more stocks
+MAX_DAYS = 100_000
+
+# Relative slowdown over the baseline reported as a regression
+DEFAULT_TOLERANCE = 0.25
+
+
+def measure(function, repeat, setup=None):
+    """
+    Times repeat calls of function, setup is called before each one and is not timed.
+    :return: dictionary of the median and min times in milliseconds and the number of runs
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "median_ms": statistics.median(times),
+        "min_ms": min(times),
+        "runs": repeat,
+    }
+
+
+def write_dataset(path, cells):
+    """
+    Writes a synthetic dataset of about cells prices, with the stocks of the real dataset
+    and more stocks when it would have more than MAX_DAYS days.
+    :return: (number of rows, number of stocks)
+    """
+    stocks = max(len(TICKERS), -(-cells // MAX_DAYS))
+    return generate_dataset(path, stocks, max(cells // stocks, 1))
+
+
+def bench_ingest(directory, sizes, repeat):
+    """
+    Loads synthetic CSV files of each size, parsed from the text (cold) and from the cache (warm).
+    :return: dictionary of results by benchmark name
+    """
+    results = {}
+    for cells in sizes:
+        path = os.path.join(directory, f"ingest_{cells}.csv")
+        rows, stocks = write_dataset(path, cells)
+        runs = repeat if cells < 1_000_000 else 1
+
+        def clear_cache():
+            shutil.rmtree(cache_dir(path), ignore_errors=True)
+
+        for mode, setup in (("cold", clear_cache), ("warm", None)):
+            result = measure(lambda: load_dataset(path), runs, setup)
+            result["cells"] = rows * stocks
+            result["cells_per_s"] = rows * stocks / (result["median_ms"] / 1000)
+            results[f"ingest/{mode}/{cells}"] = result
+        clear_cache()
+        os.remove(path)
+    return results
+
+
+def start_calculator(backend):
+    """
+    Opens the calculator offscreen and waits until it has loaded the dataset of the working directory.
+    :return: (application, dialog, startup time in milliseconds)
+    """
+    from PyQt6.QtWidgets import QApplication, QMessageBox
+
+    from StockTradeCalculator import StockTradeProfitCalculator
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    # An error dialog would block the benchmark, it is only printed
+    QMessageBox.critical = lambda parent, title, text, *args: print(title, text)
+
+    start = time.perf_counter()
+    dialog = StockTradeProfitCalculator(backend)
+    dialog.resize(1200, 700)
+    dialog.show()
+    while not dialog.dataReady:
+        app.processEvents()
+    app.processEvents()
+    return app, dialog, (time.perf_counter() - start) * 1000
+
+
+def flush(app, dialog):
+    """
+    Processes the events until the pending update of the dialog ran, then paints the graph
+    as matplotlib only schedules its draw.
+    """
+    app.processEvents()
+    while dialog.updateTimer.isActive():
+        app.processEvents()
+    dialog.graphCanvas.repaint()
+
+
+def bench_ui(directory, backend, repeat):
+    """
+    Measures the calendar highlighting, the graph and the update of the UI after each kind of input.
+    :return: dictionary of results by benchmark name
+    """
+    # The calculator loads the dataset of the working directory
+    write_dataset(os.path.join(directory, DATASET_PATH), UI_CELLS)
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        app, dialog, startup_ms = start_calculator(backend)
+        prefix = f"ui/{backend}"
+        results = {f"{prefix}/startup": {"median_ms": startup_ms, "runs": 1}}
+
+        def forget_highlight():
+            dialog.highlightKey = None
+            dialog.calendarTables.clear()
+
+        def forget_highlight_key():
+            dialog.highlightKey = None
+
+        results[f"{prefix}/highlight/cold"] = measure(
+            dialog.highlightAvailableDates, repeat, forget_highlight
+        )
+        results[f"{prefix}/highlight/warm"] = measure(
+            dialog.highlightAvailableDates, repeat, forget_highlight_key
+        )
+
+        # Two windows drawn in turn so every call changes the view
+        stock = dialog.stockComboBox.currentText()
+        max_date = dialog.data.max_date(stock)
+        windows = [
+            ((max_date[0] - 1,) + max_date[1:], max_date),
+            (dialog.data.min_date(stock), max_date),
+        ]
+        calls = iter(range(repeat * 2))
+
+        def plot():
+            dialog.plot_stock_history(stock, *windows[next(calls) % 2], True)
+            flush(app, dialog)
+
+        results[f"{prefix}/plot_stock_history"] = measure(plot, repeat)
+
+        # Each input is set to its first value, then changed back and forth starting with the
+        # second one so every call changes it, the time runs until the UI is updated and painted
+        sell_date = dialog.sellCalendar.selectedDate()
+        stocks = [stock, "Tesla" if stock != "Tesla" else "Amazon"]
+        indicator = dialog.indicatorsButton.menu().actions()[0]
+        inputs = {
+            "stock": (dialog.stockComboBox.setCurrentText, stocks),
+            "dates": (
+                lambda days: dialog.buyCalendar.setSelectedDate(
+                    sell_date.addDays(days)
+                ),
+                [-30, -37],
+            ),
+            "quantity": (dialog.quantitySpinBox.setValue, [1, 2]),
+            "theme": (dialog.apply_theme, ["Light", "Dark"]),
+            "indicators": (indicator.setChecked, [False, True]),
+        }
+        for name, (change, values) in inputs.items():
+            change(values[0])
+            flush(app, dialog)
+            counter = iter(range(1, repeat + 1))
+
+            def update():
+                change(values[next(counter) % 2])
+                flush(app, dialog)
+
+            results[f"{prefix}/update/{name}"] = measure(update, repeat)
+        indicator.setChecked(False)
+
+        dialog.close()
+        app.processEvents()
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares the median times of the results with the ones of a baseline.
+    :return: (lines of the report, names of the benchmarks slower than the baseline by more than tolerance)
+    """
+    lines = []
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            lines.append(f"{name:45} {result['median_ms']:10.2f} ms  (new)")
+            continue
+        before = baseline[name]["median_ms"]
+        ratio = result["median_ms"] / before if before else 1.0
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        lines.append(
+            f"{name:45} {result['median_ms']:10.2f} ms  {before:10.2f} ms  {ratio:6.2f}x{flag}"
+        )
+    return lines, regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", help="file the JSON results are written to")
+    parser.add_argument(
+        "--baseline", help="JSON results of an earlier run to compare with"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="slowdown over the baseline reported as a regression, 0.25 for 25%%",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each benchmark")
+    parser.add_argument(
+        "--quick", action="store_true", help="ingest files of up to 100k cells only"
+    )
+    parser.add_argument(
+        "--backend",
+        action="append",
+        choices=["matplotlib", "pyqtgraph"],
+        help="chart backends of the UI benchmarks, both by default",
+    )
+    parser.add_argument("--no-ui", action="store_true", help="skip the UI benchmarks")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = {}
+
+    # The calculator prints its progress, stdout is kept for the JSON results
+    with contextlib.redirect_stdout(
+        sys.stderr
+    ), tempfile.TemporaryDirectory() as directory:
+        sizes = QUICK_SIZES if args.quick else INGEST_SIZES
+        results.update(bench_ingest(directory, sizes, args.repeat))
+        if not args.no_ui:
+            for backend in args.backend or ["matplotlib", "pyqtgraph"]:
+                results.update(bench_ui(directory, backend, args.repeat))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        lines, regressions = compare(results, baseline, args.tolerance)
+        print("\n".join(lines))
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.tolerance:.0%}.")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Background loading of the stock market dataset.
+
+The dataset is loaded by a DataLoader running on the global QThreadPool. It
+reports its progress and the stocks found so far through Qt signals, which are
+delivered on the GUI thread, and hands over the finished PriceStore in one
+piece. A load can be cancelled, it then stops at the end of the current chunk.
+A loader given the current data first tries to only add the rows written at
+the top of the file since, and loads the whole file when that is not possible.
+"""
+
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from stock_core import DATASET_PATH, load_dataset_steps, refresh_dataset
+
+
+class LoaderSignals(QObject):
+    """
+    Signals of a DataLoader, a QRunnable can not define signals itself.
+    """
+
+    # Fraction of the file read
+    progress = pyqtSignal(float)
+    # Stocks that got their first price
+    stocksFound = pyqtSignal(list)
+    # The loaded PriceStore
+    finished = pyqtSignal(object)
+    # Emitted instead of finished when the load was cancelled
+    cancelled = pyqtSignal()
+
+
+class DataLoader(QRunnable):
+    """
+    Loads the dataset on a worker thread, one chunk at a time.
+    """
+
+    def __init__(self, path=DATASET_PATH, current=None):
+        super().__init__()
+        self.path = path
+        self.current = current  # data to refresh, None for a full load
+        self.signals = LoaderSignals()
+        self.cancelEvent = threading.Event()
+
+    def cancel(self):
+        """
+        Asks the loader to stop, the load stops between two chunks.
+        """
+        self.cancelEvent.set()
+
+    def isCancelled(self):
+        return self.cancelEvent.is_set()
+
+    def start(self):
+        """
+        Runs the loader on the global thread pool.
+        """
+        QThreadPool.globalInstance().start(self)
+
+    def run(self):
+        if self.current is not None:
+            data = refresh_dataset(self.current, self.path)
+            if data is not None:
+                self.signals.finished.emit(data)
+                return
+            print(f"{self.path} can not be refreshed, loading it again.")
+
+        steps = load_dataset_steps(self.path)
+        while True:
+            if self.cancelEvent.is_set():
+                # Closing the generator closes the file, no cache is written
+                steps.close()
+                self.signals.cancelled.emit()
+                return
+            try:
+                progress, stocks = next(steps)
+            except StopIteration as stop:
+                self.signals.finished.emit(stop.value)
+                return
+            self.signals.progress.emit(progress)
+            if stocks:
+                self.signals.stocksFound.emit(stocks)
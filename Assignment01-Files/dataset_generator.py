@@ -0,0 +1,222 @@
+"""
+Generator of synthetic stock market datasets in the layout of Transformed_Stock_Market_Dataset.csv.
+
+The file has a Date column then one column per stock, the newest day first.
+Only trading days are written: weekends and a few holidays a year are left out.
+Dates are written "m/d/Y" or "d-m-Y", the two formats string_date_into_tuple
+reads, and prices above a thousand are quoted with thousands separators, some
+stocks grouped like "5,89,498". Some stocks are listed late and have no price
+before, and a fraction of the cells is empty or holds text that is not a price.
+
+The rows are generated and written a chunk at a time, so the memory used does
+not depend on the number of days and tens of thousands of stocks can be written.
+
+Usage:
+    python dataset_generator.py big.csv --tickers 20000 --years 30
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+# Stocks of the real dataset, more columns are named Stock_<n>
+TICKERS = [
+    "Natural_Gas",
+    "Crude_oil",
+    "Copper",
+    "Bitcoin",
+    "Platinum",
+    "Ethereum",
+    "S&P_500",
+    "Nasdaq_100",
+    "Apple",
+    "Tesla",
+    "Microsoft",
+    "Silver",
+    "Google",
+    "Nvidia",
+    "Berkshire",
+    "Netflix",
+    "Amazon",
+    "Meta",
+    "Gold",
+]
+
+# Trading days in a year, used to convert years of history into days
+TRADING_DAYS = 252
+
+# Text found in the cells that can not be parsed
+BAD_CELLS = ["N/A", "-", "#VALUE!", "null", "n.a."]
+
+# Cells generated per chunk of rows
+CHUNK_CELLS = 1 << 20
+
+
+def tickers_for(count):
+    """
+    :return: names of count stocks, the stocks of the real dataset first
+    """
+    return TICKERS[:count] + [f"Stock_{i}" for i in range(len(TICKERS), count)]
+
+
+def trading_days(days, end, rng, holidays_per_year=9):
+    """
+    Picks the last days trading days up to end: weekdays without New Year, Christmas and
+    holidays_per_year - 2 other random weekdays of each year.
+    :return: datetime64[D] array, the newest day first
+    """
+    end = np.datetime64(end, "D")
+    # Enough calendar days for the weekends and the holidays
+    start = end - int(days * 7 / 5 * 1.1) - 30
+    weekdays = np.arange(start, end + 1)
+    weekdays = weekdays[np.is_busday(weekdays)]
+
+    years = weekdays.astype("datetime64[Y]")
+    holidays = []
+    for year in np.unique(years):
+        holidays += [np.datetime64(f"{year}-01-01"), np.datetime64(f"{year}-12-25")]
+        in_year = weekdays[years == year]
+        count = min(max(holidays_per_year - 2, 0), len(in_year))
+        holidays += list(rng.choice(in_year, count, replace=False))
+    weekdays = weekdays[~np.isin(weekdays, np.array(holidays, dtype="datetime64[D]"))]
+    return weekdays[::-1][:days]
+
+
+def format_date(day, date_style):
+    """
+    Writes a date "m/d/Y" or "d-m-Y". The "mixed" style writes like the real dataset,
+    "m/d/Y" when the day is 12 or less and "d-m-Y" otherwise.
+    :return: the date string
+    """
+    day = day.astype(object)
+    if date_style == "slash" or (date_style == "mixed" and day.day <= 12):
+        return f"{day.month}/{day.day}/{day.year}"
+    return f"{day.day:02}-{day.month:02}-{day.year}"
+
+
+def format_price(price, indian=False):
+    """
+    Writes a price like the dataset, "43,194.70" above a thousand or "5,89,498" for the stocks
+    grouped in lakhs, which are written without decimals.
+    :return: the cell text
+    """
+    if price < 1000:
+        return f"{price:.2f}"
+    if not indian:
+        return f'"{price:,.2f}"'
+    digits = str(int(round(price)))
+    head, tail = digits[:-3], digits[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    return '"' + ",".join([head] + groups + [tail]) + '"'
+
+
+def generate_dataset(
+    path,
+    tickers=len(TICKERS),
+    days=1013,
+    end="2024-12-31",
+    missing=0.01,
+    bad=0.001,
+    late=0.2,
+    date_style="mixed",
+    seed=0,
+):
+    """
+    Writes a synthetic dataset of tickers stocks over days trading days ending on end.
+    missing and bad are the fractions of empty and unparseable cells, late the fraction
+    of stocks listed after the first day. date_style is "mixed", "slash" or "dash".
+    :return: (number of rows, number of stocks)
+    """
+    rng = np.random.default_rng(seed)
+    dates = trading_days(days, end, rng)
+    rows = len(dates)
+
+    # Random walks going back in time from a last price between 1 and 5000
+    current = rng.uniform(1, 5000, tickers)
+    volatility = rng.uniform(0.005, 0.04, tickers)
+    indian = rng.random(tickers) < 0.05
+    # Row of the first price of each stock, the rows after it are before its listing
+    listed = np.where(
+        rng.random(tickers) < late, rng.integers(0, max(rows, 1), tickers), rows
+    )
+
+    chunk_rows = max(CHUNK_CELLS // max(tickers, 1), 1)
+    with open(path, "w", encoding="utf-8", newline="\n") as file:
+        file.write(",".join(["Date"] + tickers_for(tickers)) + "\n")
+        for first in range(0, rows, chunk_rows):
+            count = min(chunk_rows, rows - first)
+            steps = rng.normal(0, volatility, (count, tickers))
+            prices = current * np.exp(np.cumsum(steps, axis=0))
+            current = prices[-1]
+
+            lines = [
+                [format_price(price, grouped) for price, grouped in zip(row, indian)]
+                for row in prices.tolist()
+            ]
+
+            # Empty cells for the missing prices and the days before a listing
+            draws = rng.random((count, tickers))
+            empty = (draws < missing) | (first + np.arange(count)[:, None] >= listed)
+            for i, j in zip(*np.nonzero(empty)):
+                lines[i][j] = ""
+            broken = (draws >= missing) & (draws < missing + bad) & ~empty
+            for i, j in zip(*np.nonzero(broken)):
+                lines[i][j] = BAD_CELLS[rng.integers(len(BAD_CELLS))]
+
+            file.writelines(
+                format_date(day, date_style) + "," + ",".join(line) + "\n"
+                for day, line in zip(dates[first : first + count], lines)
+            )
+    return rows, tickers
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("path", help="CSV file to write")
+    parser.add_argument("--tickers", type=int, default=len(TICKERS))
+    history = parser.add_mutually_exclusive_group()
+    history.add_argument("--days", type=int, help="trading days of history")
+    history.add_argument("--years", type=float, help="years of history")
+    parser.add_argument("--end", default="2024-12-31", help="last day, yyyy-mm-dd")
+    parser.add_argument(
+        "--missing", type=float, default=0.01, help="fraction of empty cells"
+    )
+    parser.add_argument(
+        "--bad", type=float, default=0.001, help="fraction of unparseable cells"
+    )
+    parser.add_argument(
+        "--late", type=float, default=0.2, help="fraction of stocks listed late"
+    )
+    parser.add_argument(
+        "--date-style", choices=["mixed", "slash", "dash"], default="mixed"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    days = args.days or 1013
+    if args.years is not None:
+        days = int(args.years * TRADING_DAYS)
+    rows, tickers = generate_dataset(
+        args.path,
+        args.tickers,
+        days,
+        args.end,
+        args.missing,
+        args.bad,
+        args.late,
+        args.date_style,
+        args.seed,
+    )
+    print(f"Wrote {rows} days of {tickers} stocks to {args.path}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
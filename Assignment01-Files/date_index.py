@@ -0,0 +1,81 @@
+"""
+Index of the trading days of one stock.
+
+The days are kept as a sorted array of ordinal days (days since the epoch) and
+as a bitmap with one flag per calendar day between the first and last trading
+day. Membership is one bitmap lookup, the nearest trading day a binary search
+and the first and last days are read from the ends of the array.
+"""
+
+import numpy as np
+
+
+class DateIndex:
+    """
+    Trading days of a stock.
+
+    - days: sorted datetime64[D] array of the trading days
+    - ordinals: the same days as int64 days since the epoch
+    - bitmap: boolean array, True for the calendar days from the first trading day that are trading days
+    """
+
+    def __init__(self, days):
+        self.days = np.asarray(days, dtype="datetime64[D]")
+        self.ordinals = self.days.astype(np.int64)
+        self.start = int(self.ordinals[0]) if len(self.ordinals) else 0
+        size = int(self.ordinals[-1]) - self.start + 1 if len(self.ordinals) else 0
+        self.bitmap = np.zeros(size, dtype=bool)
+        self.bitmap[self.ordinals - self.start] = True
+
+    def __len__(self):
+        return len(self.days)
+
+    def __contains__(self, day):
+        offset = int(np.datetime64(day, "D").astype(np.int64)) - self.start
+        return 0 <= offset < len(self.bitmap) and bool(self.bitmap[offset])
+
+    def contains(self, days):
+        """
+        Vectorized membership of several days.
+        :return: boolean array, True for the days that are trading days
+        """
+        offsets = np.asarray(days, dtype="datetime64[D]").astype(np.int64) - self.start
+        inside = (offsets >= 0) & (offsets < len(self.bitmap))
+        result = np.zeros(offsets.shape, dtype=bool)
+        result[inside] = self.bitmap[offsets[inside]]
+        return result
+
+    def first(self):
+        """
+        :return: the first trading day or None
+        """
+        return self.days[0] if len(self.days) else None
+
+    def last(self):
+        """
+        :return: the last trading day or None
+        """
+        return self.days[-1] if len(self.days) else None
+
+    def nearest(self, day, side="nearest"):
+        """
+        Finds the trading day closest to a day, the day itself when it is a trading day.
+        side is "before" for the last trading day on or before the day, "after" for the first one
+        on or after it and "nearest" for the closest of both, the earlier one on a tie.
+        :return: np.datetime64 day or None when there is no trading day on that side
+        """
+        if not len(self.days):
+            return None
+        day = np.datetime64(day, "D")
+        if day in self:
+            return day
+        i = np.searchsorted(self.days, day)
+        before = self.days[i - 1] if i > 0 else None
+        after = self.days[i] if i < len(self.days) else None
+        if side == "before":
+            return before
+        if side == "after":
+            return after
+        if before is None or after is None:
+            return after if before is None else before
+        return before if day - before <= after - day else after
@@ -0,0 +1,114 @@
+"""
+Level of detail of the price series drawn on the graph.
+
+A min/max pyramid is built once per stock: level k keeps, for every bucket of
+2**k market days, the index of the lowest and of the highest price. A window of
+any size is then reduced to about the pixel width of the graph by reading one
+level, so the peaks and troughs stay visible and the cost depends on the width
+of the graph instead of the length of the window.
+"""
+
+import numpy as np
+
+from price_store import to_day
+
+
+def pair_extremes(values, low, high):
+    """
+    Merges the buckets two by two, the last bucket is paired with itself when the count is odd.
+    :return: (low, high) index arrays of the merged buckets
+    """
+    if len(low) % 2:
+        low = np.append(low, low[-1])
+        high = np.append(high, high[-1])
+    low_a, low_b = low[0::2], low[1::2]
+    high_a, high_b = high[0::2], high[1::2]
+    return (
+        np.where(values[low_a] <= values[low_b], low_a, low_b),
+        np.where(values[high_a] >= values[high_b], high_a, high_b),
+    )
+
+
+class MinMaxPyramid:
+    """
+    Min/max pyramid of the available prices of one stock.
+    """
+
+    def __init__(self, dates, prices):
+        self.dates = dates
+        self.prices = prices
+
+        # levels[k - 1] holds the (low, high) indices of the buckets of 2**k days
+        self.levels = []
+        low = high = np.arange(len(prices))
+        while len(low) > 1:
+            low, high = pair_extremes(prices, low, high)
+            self.levels.append((low, high))
+
+    def indices(self, start, end, max_points):
+        """
+        Picks at most about max_points indices between start and end (excluded),
+        keeping the first and last index and the extremes of every bucket.
+        :return: sorted index array
+        """
+        count = end - start
+        if count <= max_points:
+            return np.arange(start, end)
+
+        # Smallest level giving at most max_points points (two per bucket)
+        level = int(np.ceil(np.log2(2 * count / max(max_points, 2))))
+        level = min(max(level, 1), len(self.levels))
+        low, high = self.levels[level - 1]
+        first_bucket = start >> level
+        last_bucket = (end - 1) >> level
+
+        # The buckets cut by the window are reduced from the raw prices
+        edges = []
+        for edge_start, edge_end in (
+            (start, min((first_bucket + 1) << level, end)),
+            (max(last_bucket << level, start), end),
+        ):
+            edge = self.prices[edge_start:edge_end]
+            edges += [edge_start + edge.argmin(), edge_start + edge.argmax()]
+
+        picked = np.concatenate(
+            (
+                low[first_bucket + 1 : last_bucket],
+                high[first_bucket + 1 : last_bucket],
+                [start, end - 1],
+                edges,
+            )
+        )
+        return np.unique(picked)
+
+
+class PyramidCache:
+    """
+    Pyramids of the stocks already shown, built again when the price store changes.
+    """
+
+    def __init__(self):
+        self.store = None
+        self.pyramids = {}
+
+    def pyramid(self, store, stock):
+        """
+        :return: the MinMaxPyramid of a stock, built on first use
+        """
+        if store is not self.store:
+            self.store = store
+            self.pyramids = {}
+        if stock not in self.pyramids:
+            self.pyramids[stock] = MinMaxPyramid(*store.history(stock))
+        return self.pyramids[stock]
+
+    def window(self, store, stock, start_tuple, end_tuple, max_points):
+        """
+        Reduces the available prices of a stock between two dates (inclusive) to about max_points points.
+        :return: (dates, prices, positions) where positions is the market day index of each point in the window
+        """
+        pyramid = self.pyramid(store, stock)
+        start = np.searchsorted(pyramid.dates, to_day(start_tuple), side="left")
+        end = np.searchsorted(pyramid.dates, to_day(end_tuple), side="right")
+        picked = pyramid.indices(start, end, max_points)
+        return pyramid.dates[picked], pyramid.prices[picked], picked - start
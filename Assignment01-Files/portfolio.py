@@ -0,0 +1,188 @@
+"""
+Portfolio of positions valued together over the columns of a PriceStore.
+
+A position is a (stock, quantity, buy date, sell date) row valued with the same
+rules as a single trade of the dialog. The value of the portfolio over time is
+kept as a difference array of the quantity held per stock and date: a position
+adds its quantity on its buy date and removes it the day after its sell date,
+so changing one position is O(1) before the cumulative sum of the curve.
+Only the stocks of the positions get a row of differences and of forward
+filled prices, so the memory and the curve do not grow with the store.
+"""
+
+import numpy as np
+
+from profit_engine import as_days, lookup_prices, stock_columns, value_trades
+
+
+def forward_fill(prices, mask):
+    """
+    Fills the missing prices with the last available price of the same row, 0 before the first one.
+    :return: float64 array of the shape of prices
+    """
+    positions = np.arange(prices.shape[1])
+    last = np.maximum.accumulate(np.where(mask, positions, -1), axis=1)
+    rows = np.arange(len(prices))[:, None]
+    return np.where(last >= 0, prices[rows, np.maximum(last, 0)], 0.0)
+
+
+# Arrays of a Portfolio holding one entry per position, with their type and the value of a new entry
+POSITION_FIELDS = {
+    "stocks": (object, ""),
+    "columns": (np.intp, -1),
+    "quantities": (np.float64, 0.0),
+    "buyIndex": (np.intp, 0),
+    "sellIndex": (np.intp, 0),
+    "buyPrices": (np.float64, np.nan),
+    "sellPrices": (np.float64, np.nan),
+    "valid": (bool, False),
+}
+
+
+class Portfolio:
+    """
+    Positions of a portfolio, stored as one array per field with one entry per position.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        for name, (dtype, _) in POSITION_FIELDS.items():
+            setattr(self, name, np.array([], dtype=dtype))
+
+        # Row of each stock of the positions in held and filledPrices, by column of the store
+        self.slots = {}
+        # Quantity held per stock, as differences between consecutive dates
+        self.held = np.zeros((0, len(store.dates) + 1))
+        self.filledPrices = np.zeros((0, len(store.dates)))
+
+    def __len__(self):
+        return len(self.stocks)
+
+    def lookup(self, stocks, quantities, buy_dates, sell_dates):
+        """
+        Looks up the prices and date indices of positions.
+        :return: dictionary of arrays, one entry per position
+        """
+        buy_days = as_days(buy_dates)
+        sell_days = as_days(sell_dates)
+        columns = stock_columns(self.store, stocks)
+        buy_prices, buy_valid = lookup_prices(self.store, columns, buy_days)
+        sell_prices, sell_valid = lookup_prices(self.store, columns, sell_days)
+        return {
+            "stocks": np.asarray(stocks, dtype=object),
+            "columns": columns,
+            "quantities": np.asarray(quantities, dtype=np.float64),
+            "buyIndex": np.searchsorted(self.store.dates, buy_days),
+            "sellIndex": np.searchsorted(self.store.dates, sell_days),
+            "buyPrices": buy_prices,
+            "sellPrices": sell_prices,
+            "valid": buy_valid & sell_valid & (buy_days <= sell_days),
+        }
+
+    def slots_of(self, columns):
+        """
+        Rows of stocks in held and filledPrices, the rows of the stocks not seen yet are added.
+        :return: array of the rows, one per column
+        """
+        new = [
+            column
+            for column in dict.fromkeys(columns.tolist())
+            if column not in self.slots
+        ]
+        if new:
+            first = len(self.slots)
+            self.slots.update((column, first + i) for i, column in enumerate(new))
+            self.held = np.vstack((self.held, np.zeros((len(new), self.held.shape[1]))))
+            self.filledPrices = np.vstack(
+                (
+                    self.filledPrices,
+                    forward_fill(self.store.prices[new], self.store.mask[new]),
+                )
+            )
+        return np.array([self.slots[column] for column in columns.tolist()], np.intp)
+
+    def hold(self, rows, sign):
+        """
+        Adds (sign 1) or removes (sign -1) the quantities of positions from the held quantities.
+        """
+        valid = self.valid[rows]
+        columns = self.slots_of(self.columns[rows][valid])
+        quantities = sign * self.quantities[rows][valid]
+        np.add.at(self.held, (columns, self.buyIndex[rows][valid]), quantities)
+        np.add.at(self.held, (columns, self.sellIndex[rows][valid] + 1), -quantities)
+
+    def set_positions(self, stocks, quantities, buy_dates, sell_dates):
+        """
+        Replaces every position, the arguments hold one entry per position.
+        """
+        for name, values in self.lookup(
+            stocks, quantities, buy_dates, sell_dates
+        ).items():
+            setattr(self, name, values)
+        # Only the stocks of the new positions are kept
+        self.slots = {}
+        self.held = self.held[:0]
+        self.filledPrices = self.filledPrices[:0]
+        self.hold(slice(None), 1)
+
+    def set_position(self, row, stock, quantity, buy_date, sell_date):
+        """
+        Changes one position, a row equal to the number of positions adds a new one.
+        The dates are np.datetime64 days, NaT for a date that is not valid.
+        """
+        if row == len(self):
+            for name, (_, empty) in POSITION_FIELDS.items():
+                setattr(self, name, np.append(getattr(self, name), empty))
+        else:
+            self.hold([row], -1)
+
+        for name, values in self.lookup(
+            [stock], [quantity], [buy_date], [sell_date]
+        ).items():
+            getattr(self, name)[row] = values[0]
+        self.hold([row], 1)
+
+    def remove_position(self, row):
+        """
+        Removes one position.
+        """
+        self.hold([row], -1)
+        for name in POSITION_FIELDS:
+            setattr(self, name, np.delete(getattr(self, name), row))
+
+    def trades(self):
+        """
+        Values every position, NaN for the positions that are not valid.
+        :return: (purchase totals, sell totals, profits) arrays
+        """
+        return value_trades(
+            np.where(self.valid, self.buyPrices, np.nan),
+            np.where(self.valid, self.sellPrices, np.nan),
+            self.quantities,
+        )
+
+    def totals(self):
+        """
+        Values the whole portfolio, the positions that are not valid are left out.
+        :return: (purchase total, sell total, profit)
+        """
+        purchase_totals, sell_totals, profits = self.trades()
+        return (
+            float(np.nansum(purchase_totals)),
+            float(np.nansum(sell_totals)),
+            float(np.nansum(profits)),
+        )
+
+    def curve(self):
+        """
+        Computes the value of the held positions on every date between the first buy and the last sell.
+        Missing prices are replaced by the last available price of the stock.
+        :return: (dates, values) arrays
+        """
+        if not self.valid.any():
+            return self.store.dates[:0], np.array([])
+        start = self.buyIndex[self.valid].min()
+        end = self.sellIndex[self.valid].max() + 1
+        held = np.cumsum(self.held[:, :end], axis=1)[:, start:]
+        values = (held * self.filledPrices[:, start:end]).sum(axis=0)
+        return self.store.dates[start:end], values
@@ -0,0 +1,194 @@
+"""
+Portfolio mode of the stock calculator.
+
+A table of positions (stock, quantity, buy date, sell date) valued together,
+with the totals of the portfolio and its value over time. The valuation is
+done by portfolio.Portfolio, only the edited position is valued again.
+"""
+
+import numpy as np
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import (
+    QDialog,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+from portfolio import Portfolio
+from stock_chart import create_chart
+
+# Columns of the table, the last three are computed
+STOCK_COLUMN, QUANTITY_COLUMN, BUY_COLUMN, SELL_COLUMN = range(4)
+TABLE_HEADERS = [
+    "Stock",
+    "Quantity",
+    "Buy Date",
+    "Sell Date",
+    "Purchase Total",
+    "Sell Total",
+    "Profit",
+]
+
+
+def parse_day(text):
+    """
+    Converts a date written "yyyy-MM-dd" into a numpy day.
+    :return: np.datetime64 with a day resolution, NaT if the date is not valid
+    """
+    try:
+        return np.datetime64(text.strip(), "D")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+class PortfolioDialog(QDialog):
+    """
+    Provides the following functionality:
+
+    - Allows adding, editing and removing positions
+    - Displays the purchase total, sell total and profit of every position
+    - Displays the totals of the portfolio
+    - Displays the value of the portfolio over time
+    """
+
+    def __init__(self, data, chartBackend="matplotlib", parent=None):
+        super().__init__(parent)
+        self.portfolio = Portfolio(data)
+
+        self.table = QTableWidget(0, len(TABLE_HEADERS), self)
+        self.table.setHorizontalHeaderLabels(TABLE_HEADERS)
+        self.table.cellChanged.connect(self.updatePosition)
+
+        self.addButton = QPushButton("Add Position", self)
+        self.removeButton = QPushButton("Remove Position", self)
+        self.removeButton.clicked.connect(self.removeSelectedPosition)
+
+        self.purchaseTotalLabel = QLabel("Purchase Total: $0.00", self)
+        self.sellTotalLabel = QLabel("Sell Total: $0.00", self)
+        self.profitTotalLabel = QLabel("Profit: $0.00", self)
+
+        # Value of the portfolio over time
+        self.chart = create_chart(chartBackend)
+
+        buttonLayout = QHBoxLayout()
+        buttonLayout.addWidget(self.addButton)
+        buttonLayout.addWidget(self.removeButton)
+        buttonLayout.addStretch()
+
+        mainLayout = QVBoxLayout(self)
+        mainLayout.addLayout(buttonLayout)
+        mainLayout.addWidget(self.table)
+        mainLayout.addWidget(self.purchaseTotalLabel)
+        mainLayout.addWidget(self.sellTotalLabel)
+        mainLayout.addWidget(self.profitTotalLabel)
+        mainLayout.addWidget(self.chart.widget)
+
+        self.setWindowTitle("Portfolio")
+        self.resize(800, 700)
+
+    def set_data(self, data):
+        """
+        Values every position again with a new dataset.
+        """
+        self.portfolio = Portfolio(data)
+        positions = [self.readRow(row) for row in range(self.table.rowCount())]
+        self.portfolio.set_positions(*zip(*positions) if positions else ([],) * 4)
+        self.showPositions(range(self.table.rowCount()))
+        self.updateTotals()
+
+    def addPosition(self, stock, quantity, buy_date, sell_date):
+        """
+        Adds a position at the end of the table, the dates are QDates.
+        """
+        row = self.table.rowCount()
+        self.table.blockSignals(True)
+        self.table.insertRow(row)
+        for column, text in enumerate(
+            [
+                stock,
+                str(quantity),
+                buy_date.toString("yyyy-MM-dd"),
+                sell_date.toString("yyyy-MM-dd"),
+            ]
+        ):
+            self.table.setItem(row, column, QTableWidgetItem(text))
+
+        # The totals are computed, they can not be edited
+        for column in range(SELL_COLUMN + 1, len(TABLE_HEADERS)):
+            item = QTableWidgetItem()
+            item.setFlags(item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+            self.table.setItem(row, column, item)
+        self.table.blockSignals(False)
+        self.updatePosition(row)
+
+    def removeSelectedPosition(self):
+        """
+        Removes the position of the current row of the table.
+        """
+        row = self.table.currentRow()
+        if row < 0:
+            return
+        self.table.removeRow(row)
+        self.portfolio.remove_position(row)
+        self.updateTotals()
+
+    def readRow(self, row):
+        """
+        :return: (stock, quantity, buy day, sell day) of a row of the table, a quantity that is not a number is 0
+        """
+        texts = [
+            self.table.item(row, column).text() if self.table.item(row, column) else ""
+            for column in range(SELL_COLUMN + 1)
+        ]
+        try:
+            quantity = float(texts[QUANTITY_COLUMN])
+        except ValueError:
+            quantity = 0.0
+        return (
+            texts[STOCK_COLUMN].strip(),
+            quantity,
+            parse_day(texts[BUY_COLUMN]),
+            parse_day(texts[SELL_COLUMN]),
+        )
+
+    def updatePosition(self, row, column=None):
+        """
+        Values the position of an edited row again and updates the totals.
+        """
+        if column is not None and column > SELL_COLUMN:
+            return
+        self.portfolio.set_position(row, *self.readRow(row))
+        self.showPositions([row])
+        self.updateTotals()
+
+    def showPositions(self, rows):
+        """
+        Shows the totals of positions, "-" when a position can not be valued.
+        The positions are valued once for all the rows.
+        """
+        purchase_totals, sell_totals, profits = self.portfolio.trades()
+        self.table.blockSignals(True)
+        for row in rows:
+            for column, values in zip(
+                range(SELL_COLUMN + 1, len(TABLE_HEADERS)),
+                (purchase_totals, sell_totals, profits),
+            ):
+                text = f"${values[row]:.2f}" if self.portfolio.valid[row] else "-"
+                self.table.item(row, column).setText(text)
+        self.table.blockSignals(False)
+
+    def updateTotals(self):
+        """
+        Updates the totals of the portfolio and its value over time.
+        """
+        purchase_total, sell_total, profit = self.portfolio.totals()
+        self.purchaseTotalLabel.setText(f"Purchase Total: ${purchase_total:.2f}")
+        self.sellTotalLabel.setText(f"Sell Total: ${sell_total:.2f}")
+        self.profitTotalLabel.setText(f"Profit: ${profit:.2f}")
+
+        dates, values = self.portfolio.curve()
+        self.chart.plot("Portfolio", dates, values)
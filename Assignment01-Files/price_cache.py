@@ -0,0 +1,260 @@
+"""
+Binary on-disk cache of the parsed stock market dataset.
+
+The cache is a folder next to the CSV file ("<file>.cache") holding one .npy
+file per array of the PriceStore and a meta.json describing the CSV it was built
+from (size, modification time and content hash). Valid caches are loaded with
+numpy memory mapping so the prices are only read from disk when they are used.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from price_store import PriceStore
+from stock_ingest import parse_rows, read_price_csv_steps, read_top_rows, run_steps
+
+# Bump when the layout of the cache changes so old caches get rebuilt
+CACHE_VERSION = 2
+
+# Arrays of the PriceStore saved in the cache
+CACHE_ARRAYS = ("dates", "prices", "mask", "first_index", "last_index")
+
+
+def cache_dir(path):
+    """
+    :return: path of the cache folder of a CSV file
+    """
+    return path + ".cache"
+
+
+def file_hash(path, block_size=1 << 20):
+    """
+    Hashes the content of a file block by block.
+    :return: hexadecimal blake2b digest
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, mode="rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_hashes(path, start, end, block_size=1 << 20):
+    """
+    Hashes the content of a file, and the same content without the bytes from start to end.
+    :return: (hash of the file, hash of the file without the range)
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    outside = hashlib.blake2b(digest_size=16)
+    with open(path, mode="rb") as file:
+        position = 0
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+            outside.update(block[: max(start - position, 0)])
+            outside.update(block[max(end - position, 0) :])
+            position += len(block)
+    return digest.hexdigest(), outside.hexdigest()
+
+
+def first_data_line(path):
+    """
+    :return: the first row of the CSV file after its header, None when there is none
+    """
+    with open(path, mode="rb") as file:
+        file.readline()
+        line = file.readline()
+    return line.rstrip(b"\r\n").decode("latin-1") if line else None
+
+
+def read_meta(directory):
+    """
+    :return: the meta data of a cache folder or None if there is no usable cache
+    """
+    try:
+        with open(os.path.join(directory, "meta.json"), mode="r") as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != CACHE_VERSION:
+        return None
+    return meta
+
+
+def write_meta(directory, meta):
+    """
+    Writes the meta data last and atomically, a cache without meta.json is never used.
+    """
+    temporary = os.path.join(directory, "meta.json.tmp")
+    with open(temporary, mode="w") as file:
+        json.dump(meta, file)
+    os.replace(temporary, os.path.join(directory, "meta.json"))
+
+
+def source_meta(path, content_hash=None):
+    """
+    Describes the CSV file the cache is built from.
+    The first data row is kept to find the rows added later at the top of the file.
+    :return: dictionary with the size, mtime, hash and first data row of the file
+    """
+    stat = os.stat(path)
+    return {
+        "version": CACHE_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "hash": content_hash if content_hash is not None else file_hash(path),
+        "first_line": first_data_line(path),
+    }
+
+
+def save_cache(store, path, meta):
+    """
+    Saves a PriceStore in the cache folder of the CSV file at path.
+    meta describes the CSV file as it was when the store was parsed.
+    """
+    directory = cache_dir(path)
+    os.makedirs(directory, exist_ok=True)
+
+    # Remove the meta first so a half written cache is never read
+    try:
+        os.remove(os.path.join(directory, "meta.json"))
+    except FileNotFoundError:
+        pass
+
+    for name in CACHE_ARRAYS:
+        temporary = os.path.join(directory, name + ".tmp.npy")
+        np.save(temporary, np.ascontiguousarray(getattr(store, name)))
+        os.replace(temporary, os.path.join(directory, name + ".npy"))
+
+    write_meta(directory, dict(meta, tickers=store.tickers))
+
+
+def load_cache(directory, meta):
+    """
+    Loads the arrays of a cache folder with memory mapping.
+    :return: a PriceStore
+    """
+    arrays = {
+        name: np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+        for name in CACHE_ARRAYS
+    }
+    store = PriceStore(meta["tickers"], **arrays)
+    store.source = meta
+    return store
+
+
+def is_valid(path, meta):
+    """
+    Checks that the cache was built from the current content of the CSV file.
+    When only the modification time changed the content hash decides, and the meta is updated.
+    :return: True if the cache can be used
+    """
+    if meta is None:
+        return False
+    stat = os.stat(path)
+    if stat.st_size != meta["size"]:
+        return False
+    if stat.st_mtime_ns == meta["mtime_ns"]:
+        return True
+
+    # Same size but touched, compare the content
+    content_hash = file_hash(path)
+    if content_hash != meta["hash"]:
+        return False
+    try:
+        meta.update(source_meta(path, content_hash))
+        write_meta(cache_dir(path), meta)
+    except OSError:
+        pass
+    return True
+
+
+def load_prices(path):
+    """
+    Loads the price store of a CSV file from its cache, or parses the file and
+    rebuilds the cache when the file changed since the cache was written.
+    :return: a PriceStore
+    """
+    return run_steps(load_prices_steps(path))
+
+
+def load_prices_steps(path):
+    """
+    Same as load_prices, one chunk of the CSV file per step when the cache has to be rebuilt.
+    :return: generator yielding (fraction of the file read, stocks that got their first price),
+    its return value is the PriceStore
+    """
+    start = time.perf_counter()
+    directory = cache_dir(path)
+    meta = read_meta(directory)
+    if is_valid(path, meta):
+        try:
+            store = load_cache(directory, meta)
+            print(f"Loaded cache {directory} in {time.perf_counter() - start:.3f}s.")
+            return store
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading cache: {e}")
+
+    # Describe the file before parsing it, a change during the parse invalidates the cache
+    meta = source_meta(path)
+    store = yield from read_price_csv_steps(path)
+    store.source = meta
+    try:
+        save_cache(store, path, meta)
+    except OSError as e:
+        print(f"Error writing cache: {e}")
+    return store
+
+
+def refresh_prices(path, store):
+    """
+    Brings a store loaded from the CSV file at path up to date when rows were added at the top of the file.
+    The file is compared with the file the store was read from, not with the cache, which another
+    instance may have brought up to date already: the store is then loaded again from the cache.
+    Only the new rows are parsed, the rest of the file must hash like the file the store was read from.
+    The cache is rewritten with the new rows.
+    :return: the updated PriceStore (the same store when the file did not change),
+    or None when the file changed otherwise and has to be loaded again
+    """
+    source = store.source
+    if source is None or source.get("first_line") is None:
+        return None
+    stat = os.stat(path)
+    if stat.st_size == source["size"] and stat.st_mtime_ns == source["mtime_ns"]:
+        return store
+
+    # The cache is newer than the store and describes the current file
+    directory = cache_dir(path)
+    meta = read_meta(directory)
+    if (
+        meta is not None
+        and meta["hash"] != source["hash"]
+        and stat.st_size == meta["size"]
+        and stat.st_mtime_ns == meta["mtime_ns"]
+    ):
+        try:
+            return load_cache(directory, meta)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error reading cache: {e}")
+
+    top = read_top_rows(path, source["first_line"])
+    if top is None:
+        return None
+    header, lines, end = top
+    content_hash, old_hash = file_hashes(path, len(header), end)
+    if old_hash != source["hash"]:
+        return None
+
+    dates, prices = parse_rows(header, lines)
+    meta = source_meta(path, content_hash)
+    store = store.add_rows(dates, prices)
+    store.source = meta
+    print(f"Added {len(lines)} new rows from {path}.")
+    try:
+        save_cache(store, path, meta)
+    except OSError as e:
+        print(f"Error writing cache: {e}")
+    return store
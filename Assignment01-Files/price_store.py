@@ -0,0 +1,209 @@
+"""
+Columnar storage for the stock market dataset.
+
+Every stock shares one sorted date axis, the prices are kept as one float64
+column per stock and a boolean mask tells which cells hold a real value.
+Lookups are done by binary search on the date axis and array slicing.
+The trading days of a stock are indexed by a DateIndex, built on first use.
+"""
+
+from datetime import date
+
+import numpy as np
+
+from date_index import DateIndex
+
+
+def to_day(date_tuple):
+    """
+    Converts a (year, month, day) tuple into a numpy day.
+    :return: np.datetime64 with a day resolution
+    """
+    return np.datetime64(date(*date_tuple), "D")
+
+
+def to_tuple(day):
+    """
+    Converts a numpy day into a (year, month, day) tuple.
+    :return: tuple representing the date
+    """
+    day = day.astype(object)
+    return day.year, day.month, day.day
+
+
+class PriceStore:
+    """
+    Holds the prices of every stock in columns indexed by a shared date axis.
+
+    - dates: sorted datetime64[D] array of every date found in the dataset
+    - prices: float64 array of shape (number of stocks, number of dates)
+    - mask: boolean array of the same shape, True where a price is available
+
+    The arrays are used as given, so they can be memory mapped from the cache.
+    """
+
+    def __init__(
+        self, tickers, dates, prices, mask=None, first_index=None, last_index=None
+    ):
+        self.tickers = list(tickers)
+        self.dates = np.asarray(dates, dtype="datetime64[D]")
+        shape = (len(self.tickers), len(self.dates))
+        self.prices = np.asarray(prices, dtype=np.float64).reshape(shape)
+        if mask is None:
+            mask = ~np.isnan(self.prices)
+        self.mask = np.asarray(mask, dtype=bool).reshape(shape)
+
+        # Index of every stock inside the price columns
+        self.columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+        # DateIndex of the stocks, built on first use, the store is never modified
+        self.date_indexes = {}
+
+        # Meta data of the CSV file the store was read from, set by price_cache
+        self.source = None
+
+        # First and last available date of each stock, so min/max are O(1)
+        if first_index is not None and last_index is not None:
+            self.first_index = np.asarray(first_index)
+            self.last_index = np.asarray(last_index)
+            return
+        self.first_index = np.full(len(self.tickers), -1)
+        self.last_index = np.full(len(self.tickers), -1)
+        if shape[1]:
+            has_value = self.mask.any(axis=1)
+            first = self.mask.argmax(axis=1)
+            last = shape[1] - 1 - self.mask[:, ::-1].argmax(axis=1)
+            self.first_index = np.where(has_value, first, -1)
+            self.last_index = np.where(has_value, last, -1)
+
+    @classmethod
+    def from_blocks(cls, tickers, dates, values):
+        """
+        Builds the store from a block of rows in file order.
+        dates is a datetime64[D] array (NaT for rows without a valid date) and
+        values a float64 array of shape (number of rows, number of stocks).
+        Rows without a valid date are skipped and when a date appears twice the last row wins.
+        :return: a PriceStore
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        values = np.asarray(values, dtype=np.float64).reshape(len(dates), len(tickers))
+        keep = ~np.isnat(dates)
+        dates = dates[keep]
+        values = values[keep]
+
+        # Reverse before np.unique so that the last occurence of a date is kept
+        unique_dates, reversed_index = np.unique(dates[::-1], return_index=True)
+        order = len(dates) - 1 - reversed_index
+        return cls(tickers, unique_dates, np.ascontiguousarray(values[order].T))
+
+    def add_rows(self, dates, values):
+        """
+        Adds rows read after the store was built, such as the new days written at the top of the file.
+        dates is a datetime64[D] array (NaT for rows without a valid date) and
+        values a float64 array of shape (number of rows, number of stocks).
+        The rows already in the store win over new rows with the same date, as they come later in the file.
+        :return: a new PriceStore, the store itself is not modified
+        """
+        new = PriceStore.from_blocks(self.tickers, dates, values)
+        keep = ~np.isin(new.dates, self.dates)
+        if not keep.any():
+            return self
+
+        # Only the new days are inserted, in date order
+        dates = np.concatenate((self.dates, new.dates[keep]))
+        order = np.argsort(dates, kind="stable")
+        prices = np.concatenate((self.prices, new.prices[:, keep]), axis=1)
+        mask = np.concatenate((self.mask, new.mask[:, keep]), axis=1)
+        return PriceStore(
+            self.tickers,
+            dates[order],
+            np.ascontiguousarray(prices[:, order]),
+            np.ascontiguousarray(mask[:, order]),
+        )
+
+    def __contains__(self, stock):
+        return stock in self.columns
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def _column(self, stock):
+        return self.columns[stock]
+
+    def price(self, stock, date_tuple):
+        """
+        Gets the price of a stock at a date.
+        :return: the price or None when there is no value for this date
+        """
+        column = self._column(stock)
+        day = to_day(date_tuple)
+        i = np.searchsorted(self.dates, day)
+        if i == len(self.dates) or self.dates[i] != day or not self.mask[column, i]:
+            return None
+        return float(self.prices[column, i])
+
+    def window(self, stock, start_tuple=None, end_tuple=None):
+        """
+        Slices the columns of a stock between two dates (inclusive).
+        No copy is made, the returned arrays are views on the store.
+        :return: (dates, prices, mask) views
+        """
+        column = self._column(stock)
+        start = 0
+        end = len(self.dates)
+        if start_tuple is not None:
+            start = np.searchsorted(self.dates, to_day(start_tuple), side="left")
+        if end_tuple is not None:
+            end = np.searchsorted(self.dates, to_day(end_tuple), side="right")
+        return (
+            self.dates[start:end],
+            self.prices[column, start:end],
+            self.mask[column, start:end],
+        )
+
+    def history(self, stock, start_tuple=None, end_tuple=None):
+        """
+        Gets the available dates and prices of a stock between two dates (inclusive).
+        :return: (dates, prices) arrays holding only the available values
+        """
+        dates, prices, mask = self.window(stock, start_tuple, end_tuple)
+        return dates[mask], prices[mask]
+
+    def available_dates(self, stock):
+        """
+        Gets every date where the stock has a price.
+        :return: sorted datetime64[D] array
+        """
+        column = self._column(stock)
+        return self.dates[self.mask[column]]
+
+    def date_index(self, stock):
+        """
+        Gets the index of the trading days of a stock.
+        :return: a DateIndex
+        """
+        if stock not in self.date_indexes:
+            self.date_indexes[stock] = DateIndex(self.available_dates(stock))
+        return self.date_indexes[stock]
+
+    def nearest_date(self, stock, date_tuple, side="nearest"):
+        """
+        Gets the trading day of a stock closest to a date, see DateIndex.nearest for side.
+        :return: (year, month, day) tuple or None when the stock has no trading day on that side
+        """
+        day = self.date_index(stock).nearest(to_day(date_tuple), side)
+        return None if day is None else to_tuple(day)
+
+    def min_date(self, stock):
+        """
+        :return: the first date with a price for the stock or None
+        """
+        first = self.first_index[self._column(stock)]
+        return None if first < 0 else to_tuple(self.dates[first])
+
+    def max_date(self, stock):
+        """
+        :return: the last date with a price for the stock or None
+        """
+        last = self.last_index[self._column(stock)]
+        return None if last < 0 else to_tuple(self.dates[last])
@@ -0,0 +1,214 @@
+"""
+Batch profit engine of the stock calculator.
+
+Values many trades at once with the same rules as the dialog: a trade is only
+valid when the stock is in the dataset, the buy date is not after the sell date
+and both dates have a price for the stock. Invalid trades get NaN totals.
+Nothing here depends on Qt, so the engine can run in batch jobs.
+"""
+
+import numpy as np
+
+
+def as_days(dates):
+    """
+    Converts dates into a numpy day array.
+    dates can be datetime64 values, ISO strings, datetime.date objects or an
+    integer array of shape (n, 3) holding (year, month, day) rows.
+    :return: datetime64[D] array
+    """
+    dates = np.asarray(dates)
+    if dates.dtype.kind in "iu" and dates.ndim == 2 and dates.shape[1] == 3:
+        months = (dates[:, 0] - 1970) * 12 + dates[:, 1] - 1
+        return months.astype("datetime64[M]").astype("datetime64[D]") + (
+            dates[:, 2] - 1
+        )
+    return dates.astype("datetime64[D]")
+
+
+def value_trades(buy_prices, sell_prices, quantities):
+    """
+    Computes the totals of trades, works on numbers as well as on arrays.
+    :return: (purchase totals, sell totals, profits)
+    """
+    purchase_total = buy_prices * quantities
+    sell_total = sell_prices * quantities
+    return purchase_total, sell_total, sell_total - purchase_total
+
+
+def lookup_prices(store, columns, days):
+    """
+    Looks up many prices at once, columns and days are broadcast together.
+    columns holds the row of each stock in the store, -1 for a stock not in the dataset.
+    :return: (prices, valid) arrays, the price is NaN where valid is False
+    """
+    columns, days = np.broadcast_arrays(np.asarray(columns), as_days(days))
+    index = np.searchsorted(store.dates, days)
+    found = index < len(store.dates)
+    index = np.where(found, index, 0)
+    if len(store.dates):
+        found &= store.dates[index] == days
+    found &= columns >= 0
+
+    safe_columns = np.where(found, columns, 0)
+    valid = found.copy()
+    if store.prices.size:
+        valid[found] = store.mask[safe_columns[found], index[found]]
+    prices = np.full(valid.shape, np.nan)
+    prices[valid] = store.prices[safe_columns[valid], index[valid]]
+    return prices, valid
+
+
+def stock_columns(store, stocks):
+    """
+    :return: int array of the row of each stock in the store, -1 for an unknown stock
+    """
+    return np.array([store.columns.get(stock, -1) for stock in stocks], dtype=np.intp)
+
+
+def batch_trades(store, stocks, buy_dates, sell_dates, quantities=1):
+    """
+    Values a list of trades, one trade per (stock, buy date, sell date, quantity) row.
+    The stocks may be given once per trade or as a single name for every trade.
+    :return: dictionary of columns (numpy arrays) with the prices, totals, profits and validity of every trade
+    """
+    buy_days = as_days(buy_dates)
+    sell_days = as_days(sell_dates)
+    if isinstance(stocks, str):
+        stocks = [stocks]
+
+    # Look up the name of every distinct stock once
+    names, inverse = np.unique(np.asarray(stocks, dtype=str), return_inverse=True)
+    columns = stock_columns(store, names)[inverse.reshape(-1)]
+
+    buy_prices, buy_valid = lookup_prices(store, columns, buy_days)
+    sell_prices, sell_valid = lookup_prices(store, columns, sell_days)
+    buy_days, sell_days = np.broadcast_arrays(buy_days, sell_days)
+    valid = buy_valid & sell_valid & (buy_days <= sell_days)
+
+    quantities = np.broadcast_to(np.asarray(quantities, dtype=np.float64), valid.shape)
+    purchase_totals, sell_totals, profits = value_trades(
+        np.where(valid, buy_prices, np.nan),
+        np.where(valid, sell_prices, np.nan),
+        quantities,
+    )
+    return {
+        "stock": np.broadcast_to(names[inverse.reshape(-1)], valid.shape),
+        "buy_date": buy_days,
+        "sell_date": sell_days,
+        "quantity": quantities,
+        "buy_price": buy_prices,
+        "sell_price": sell_prices,
+        "purchase_total": purchase_totals,
+        "sell_total": sell_totals,
+        "profit": profits,
+        "valid": valid,
+    }
+
+
+def trade_grid(store, stocks, buy_dates, sell_dates, quantities=1):
+    """
+    Values every combination of stock, buy date and sell date.
+    The prices are looked up once per (stock, date) and the trades are broadcast,
+    quantities must be a number or broadcastable to (stocks, buy dates, sell dates).
+    :return: dictionary of arrays of shape (stocks, buy dates, sell dates)
+    """
+    buy_days = as_days(buy_dates)
+    sell_days = as_days(sell_dates)
+    columns = stock_columns(store, stocks)[:, None]
+
+    buy_prices, buy_valid = lookup_prices(store, columns, buy_days[None, :])
+    sell_prices, sell_valid = lookup_prices(store, columns, sell_days[None, :])
+    valid = (
+        buy_valid[:, :, None]
+        & sell_valid[:, None, :]
+        & (buy_days[:, None] <= sell_days[None, :])
+    )
+
+    purchase_totals, sell_totals, profits = value_trades(
+        np.where(valid, buy_prices[:, :, None], np.nan),
+        np.where(valid, sell_prices[:, None, :], np.nan),
+        np.asarray(quantities, dtype=np.float64),
+    )
+    return {
+        "purchase_total": purchase_totals,
+        "sell_total": sell_totals,
+        "profit": profits,
+        "valid": valid,
+    }
+
+
+def best_trades(prices, mask):
+    """
+    Finds the most profitable buy and sell dates (buy <= sell) of every row of prices in one pass.
+    The running minimum of the buy prices gives the best buy for each sell date.
+    prices and mask have the shape (stocks, dates), only the cells where mask is True are used.
+    :return: (buy index, sell index, profit) arrays, -1 and NaN for a row without prices
+    """
+    prices = np.atleast_2d(prices)
+    mask = np.atleast_2d(mask)
+    buy_index, profits = best_buys(prices, mask)
+    sell_index = profits.argmax(axis=1)
+    rows = np.arange(len(prices))
+    has_value = mask.any(axis=1)
+    return (
+        np.where(has_value, buy_index[rows, sell_index], -1),
+        np.where(has_value, sell_index, -1),
+        np.where(has_value, profits[rows, sell_index], np.nan),
+    )
+
+
+def best_buys(prices, mask):
+    """
+    Finds the best buy date of every sell date with running minimums.
+    :return: (buy index, profit) arrays of the shape of prices, the profit is -inf where there is no price
+    """
+    buyable = np.where(mask, prices, np.inf)
+    lowest = np.minimum.accumulate(buyable, axis=1)
+
+    # Index of the running minimum, the last position where it was reached
+    positions = np.arange(prices.shape[1])
+    buy_index = np.where(mask & (buyable == lowest), positions, -1)
+    buy_index = np.maximum.accumulate(buy_index, axis=1)
+    profits = np.where(mask, prices - lowest, -np.inf)
+    return buy_index, profits
+
+
+def top_trades(prices, mask, k=5):
+    """
+    Finds the k most profitable trades of one stock, one trade (its best buy) per sell date.
+    :return: list of (buy index, sell index, profit) sorted by decreasing profit
+    """
+    buy_index, profits = best_buys(np.atleast_2d(prices), np.atleast_2d(mask))
+    buy_index, profits = buy_index[0], profits[0]
+    sells = np.flatnonzero(np.isfinite(profits))
+    if len(sells) > k:
+        sells = sells[np.argpartition(profits[sells], -k)[-k:]]
+    sells = sells[np.argsort(-profits[sells], kind="stable")]
+    return [(int(buy_index[j]), int(j), float(profits[j])) for j in sells]
+
+
+def max_drawdowns(prices, mask):
+    """
+    Finds the largest fall from a peak to a later trough of every row of prices in one pass.
+    :return: (peak index, trough index, drawdown) arrays, the drawdown is a fraction of the peak
+    (0 when the price never falls), -1 and NaN for a row without prices
+    """
+    prices = np.atleast_2d(prices)
+    mask = np.atleast_2d(mask)
+    values = np.where(mask, prices, -np.inf)
+    highest = np.maximum.accumulate(values, axis=1)
+    positions = np.arange(prices.shape[1])
+    peak_index = np.where(mask & (values == highest), positions, -1)
+    peak_index = np.maximum.accumulate(peak_index, axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdowns = np.where(mask, (prices - highest) / highest, np.inf)
+    trough_index = drawdowns.argmin(axis=1)
+    rows = np.arange(len(prices))
+    has_value = mask.any(axis=1)
+    return (
+        np.where(has_value, peak_index[rows, trough_index], -1),
+        np.where(has_value, trough_index, -1),
+        np.where(has_value, -drawdowns[rows, trough_index], np.nan),
+    )
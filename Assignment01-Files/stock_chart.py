@@ -0,0 +1,333 @@
+"""
+Chart backends of the stock calculator.
+
+- MatplotlibChart: the default chart, the market days are plotted one after the other
+- PyQtGraphChart: fast chart on a numeric date axis with auto downsampling and clip to view
+
+Both charts share the same methods (style, plot) so the dialog does not depend on the backend.
+Indicators are drawn over the prices as overlays, (label, dates, values, positions) tuples.
+Static exports are always rendered with matplotlib through export_chart.
+The chart libraries are only imported when a chart is created, so importing
+this module stays cheap.
+"""
+
+import numpy as np
+
+# Backends that can be chosen at startup
+CHART_BACKENDS = ("matplotlib", "pyqtgraph")
+
+
+def chart_title(stock_name, days):
+    return f"{stock_name} Price History - Last {days} market days"
+
+
+def draw_price_axes(axes, stock_name, dates, prices):
+    """
+    Draws the prices on matplotlib axes, one market day after the other.
+    :return: the Line2D of the prices
+    """
+    (line,) = axes.plot(np.arange(len(prices)), prices, label=stock_name)
+    axes.set_title(chart_title(stock_name, len(dates)))
+    axes.set_xlabel("Date")
+    axes.set_ylabel("Price ($)")
+
+    # Set x-axis tick labels to show only around 10 dates
+    ticks = range(0, len(dates), max(len(dates) // 10, 1))
+    axes.set_xticks(
+        ticks, [f"{d.day}-{d.month}-{d.year}" for d in dates[ticks].astype(object)]
+    )
+    axes.tick_params(axis="x", rotation=45)
+    return line
+
+
+def style_price_axes(figure, axes, line, background, text, line_color):
+    """
+    Applies the colors of a theme to matplotlib axes.
+    """
+    # Set background color
+    axes.set_facecolor(background)
+    figure.patch.set_facecolor(background)
+
+    # Set box (spines) color
+    for spine in axes.spines.values():
+        spine.set_color(text)
+
+    line.set_color(line_color)
+    axes.title.set_color(text)
+    axes.xaxis.label.set_color(text)
+    axes.yaxis.label.set_color(text)
+
+    # Set tick label colors
+    axes.tick_params(axis="x", colors=text)
+    axes.tick_params(axis="y", colors=text)
+
+
+def export_chart(path, stock_name, dates, prices, colors):
+    """
+    Renders the prices with matplotlib into an image file (png, pdf, svg...).
+    colors is a (background, text, line) tuple.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 5))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot(111)
+    line = draw_price_axes(axes, stock_name, dates, prices)
+    style_price_axes(figure, axes, line, *colors)
+    figure.subplots_adjust(top=0.9, bottom=0.2, left=0.15, right=0.9)
+    figure.savefig(path, facecolor=figure.get_facecolor())
+
+
+class MatplotlibChart:
+    """
+    Matplotlib chart, the axes and the line are created once and only their data is updated.
+    """
+
+    # The prices are downsampled by the dialog before being plotted
+    autoDownsampling = False
+
+    def __init__(self):
+        # Imported here so the window can be shown before matplotlib is loaded
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+
+        self.widget = FigureCanvas(Figure())
+        figure = self.widget.figure
+        self.axes = figure.add_subplot(111)
+
+        # The line is animated so it can be redrawn alone (blitting) when the axes did not change
+        self.line = draw_price_axes(self.axes, "", np.array([], "datetime64[D]"), [])
+        self.line.set_animated(True)
+
+        # Adjust the layout to minimize space at the top
+        figure.subplots_adjust(top=0.9, bottom=0.2, left=0.15, right=0.9)
+
+        # Lines of the indicators, created on first use and hidden when not shown
+        self.overlayLines = {}
+        self.colors = None
+
+        # Background of the axes without the line, saved after every full draw
+        self.background = None
+        self.view = None
+        self.widget.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        """
+        Saves the freshly drawn background and draws the animated lines over it.
+        """
+        self.background = self.widget.copy_from_bbox(self.widget.figure.bbox)
+        self.draw_lines()
+
+    def draw_lines(self):
+        """
+        Draws the animated lines, the indicators below the prices.
+        """
+        for line in self.overlayLines.values():
+            if line.get_visible():
+                self.axes.draw_artist(line)
+        self.axes.draw_artist(self.line)
+
+    def style(self, background, text, line_color):
+        """
+        Applies the colors of the current theme to the chart.
+        """
+        self.colors = (background, text)
+        style_price_axes(
+            self.widget.figure, self.axes, self.line, background, text, line_color
+        )
+
+        # Force a full draw as every color changed
+        self.view = None
+        self.widget.draw_idle()
+
+    def overlay_line(self, label):
+        """
+        :return: the animated line of an indicator, created on first use
+        """
+        if label not in self.overlayLines:
+            (line,) = self.axes.plot([], [], label=label, linewidth=1)
+            line.set_animated(True)
+            self.overlayLines[label] = line
+        return self.overlayLines[label]
+
+    def plot(
+        self, stock_name, dates, prices, positions=None, resize=False, overlays=()
+    ):
+        """
+        Shows the prices, only the data of the line, the limits, the title and the ticks are updated.
+        positions is the market day index of each price when the prices were downsampled.
+        """
+        if positions is None:
+            positions = np.arange(len(prices))
+        days = positions[-1] + 1 if len(positions) else 0
+
+        # The market days are plotted one after the other, like categories
+        self.line.set_data(positions, prices)
+        self.line.set_label(stock_name)
+
+        for line in self.overlayLines.values():
+            line.set_visible(False)
+        labels = []
+        for label, _, values, overlay_positions in overlays:
+            line = self.overlay_line(label)
+            line.set_data(overlay_positions, values)
+            line.set_visible(True)
+            labels.append(label)
+
+        title = chart_title(stock_name, days)
+
+        # Set x-axis tick labels to show only around 10 dates, on the plotted points
+        ticks = np.searchsorted(positions, range(0, days, max(days // 10, 1)))
+
+        # Limits with the same margins as the default autoscale
+        if len(prices):
+            low, high = prices.min(), prices.max()
+            for _, _, values, _ in overlays:
+                if np.isfinite(values).any():
+                    low = min(low, np.nanmin(values))
+                    high = max(high, np.nanmax(values))
+            margin = (high - low) * 0.05 or 1.0
+            xlim = (-0.05 * max(days - 1, 1), 1.05 * max(days - 1, 1))
+            ylim = (low - margin, high + margin)
+        else:
+            xlim, ylim = (0.0, 1.0), (0.0, 1.0)
+
+        # Convert the dates of the ticks to formatted strings for the x-axis
+        date_strings = [
+            f"{d.day}-{d.month}-{d.year}" for d in dates[ticks].astype(object)
+        ]
+
+        # The dates are part of the view, a shifted window with the same limits has other labels
+        view = (
+            title,
+            tuple(positions[ticks]),
+            tuple(date_strings),
+            xlim,
+            ylim,
+            tuple(labels),
+        )
+        if view == self.view and self.background is not None:
+            # Nothing but the lines changed, only redraw the lines over the saved background
+            self.widget.restore_region(self.background)
+            self.draw_lines()
+            self.widget.blit(self.widget.figure.bbox)
+        else:
+            self.view = view
+            self.axes.set_xticks(positions[ticks], date_strings)
+            self.axes.set_xlim(*xlim)
+            self.axes.set_ylim(*ylim)
+            self.axes.title.set_text(title)
+            self.update_legend(labels)
+
+            # Render the canvas on the next tick of the event loop
+            self.widget.draw_idle()
+
+        if resize:
+            # Adjust figure size to match the window size
+            self.widget.figure.set_size_inches(
+                self.widget.width() / self.widget.devicePixelRatio(),
+                self.widget.height() / self.widget.devicePixelRatio(),
+            )
+
+    def update_legend(self, labels):
+        """
+        Shows a legend of the prices and of the indicators, only when indicators are shown.
+        """
+        legend = self.axes.get_legend()
+        if legend is not None:
+            legend.remove()
+        if not labels:
+            return
+        background, text = self.colors or ("white", "black")
+        self.axes.legend(
+            handles=[self.line] + [self.overlayLines[label] for label in labels],
+            loc="upper left",
+            fontsize="small",
+            facecolor=background,
+            edgecolor=text,
+            labelcolor=text,
+        )
+
+
+class PyQtGraphChart:
+    """
+    pyqtgraph chart, the dates are plotted on a numeric time axis.
+    Only the points visible in the view are drawn and they are downsampled to the width of the widget,
+    so panning and zooming stay fluid on years of daily prices.
+    """
+
+    # pyqtgraph downsamples the visible prices itself, it gets every price
+    autoDownsampling = True
+
+    def __init__(self):
+        # Imported here so the window can be shown before pyqtgraph is loaded
+        import pyqtgraph as pg  # type: ignore[import-untyped]
+
+        self.widget = pg.PlotWidget(axisItems={"bottom": pg.DateAxisItem()})
+        self.widget.setLabel("bottom", "Date")
+        self.widget.setLabel("left", "Price ($)")
+        self.widget.setClipToView(True)
+        self.widget.setDownsampling(auto=True, mode="peak")
+        self.widget.showGrid(x=True, y=True, alpha=0.2)
+        self.curve = self.widget.plot([], [])
+        self.title = ""
+        self.text = None
+
+        # Curves of the indicators, listed in a legend
+        self.widget.addLegend(offset=(10, 10))
+        self.overlayCurves = []
+
+    def style(self, background, text, line_color):
+        """
+        Applies the colors of the current theme to the chart.
+        """
+        self.text = text
+        self.widget.setBackground(background)
+        for name in ("bottom", "left"):
+            axis = self.widget.getAxis(name)
+            axis.setPen(text)
+            axis.setTextPen(text)
+        self.curve.setPen(line_color, width=2)
+        self.widget.setTitle(self.title, color=text)
+
+    def plot(
+        self, stock_name, dates, prices, positions=None, resize=False, overlays=()
+    ):
+        """
+        Shows the prices, the x values are the dates in seconds since the epoch.
+        """
+        import pyqtgraph as pg  # type: ignore[import-untyped]
+
+        seconds = dates.astype("datetime64[s]").astype(np.int64).astype(np.float64)
+        self.curve.setData(seconds, np.asarray(prices, dtype=np.float64))
+
+        # The indicators are few, their curves are made again on every plot
+        for curve in self.overlayCurves:
+            self.widget.removeItem(curve)
+        self.overlayCurves = [
+            self.widget.plot(
+                overlay_dates.astype("datetime64[s]")
+                .astype(np.int64)
+                .astype(np.float64),
+                np.asarray(values, dtype=np.float64),
+                name=label,
+                pen=pg.intColor(i, hues=len(overlays) + 1),
+                connect="finite",
+            )
+            for i, (label, overlay_dates, values, _) in enumerate(overlays)
+        ]
+        self.title = chart_title(stock_name, len(dates))
+        self.widget.setTitle(self.title, color=self.text)
+        self.widget.enableAutoRange()
+
+
+def create_chart(backend):
+    """
+    :return: the chart of the given backend
+    """
+    if backend == "pyqtgraph":
+        return PyQtGraphChart()
+    if backend != "matplotlib":
+        print(f"Unknown chart backend {backend}, using matplotlib.")
+    return MatplotlibChart()
@@ -0,0 +1,138 @@
+"""
+Headless core of the stock calculator: dataset loading, price lookup and trade valuation.
+
+The dialog is built on top of this module, which imports neither Qt nor
+matplotlib so batch jobs and services can use the calculator without a GUI.
+"""
+
+from datetime import datetime
+
+from price_cache import load_prices_steps, refresh_prices
+from price_store import PriceStore, to_tuple
+from profit_engine import value_trades
+from stock_ingest import run_steps
+
+# Dataset read by default, relative to the working directory
+DATASET_PATH = "Transformed_Stock_Market_Dataset.csv"
+
+
+class TradeError(ValueError):
+    """
+    Raised when a trade can not be valued, the message is meant for the user.
+    """
+
+
+def load_dataset(path=DATASET_PATH):
+    """
+    This code reads the stock market CSV file and generates a columnar price store.
+    Cells that can not be parsed are stored as missing values.
+    :return: a PriceStore, empty when the file can not be read
+    """
+    return run_steps(load_dataset_steps(path))
+
+
+def load_dataset_steps(path=DATASET_PATH):
+    """
+    Same as load_dataset, one chunk of the CSV file per step when it has to be parsed.
+    :return: generator yielding (fraction of the file read, stocks that got their first price),
+    its return value is the PriceStore
+    """
+    try:
+        data = yield from load_prices_steps(path)
+        print("Data loaded successfully.")
+        print(
+            f"Stocks available: {data.tickers}"
+        )  # Debugging: Print all available stock names
+    except Exception as e:
+        print(f"Error reading data: {e}")
+        data = PriceStore([], [], [])
+    return data
+
+
+def refresh_dataset(data, path=DATASET_PATH):
+    """
+    Adds to a loaded dataset the rows written at the top of the CSV file since it was loaded.
+    :return: the updated PriceStore, or None when the file has to be loaded again
+    """
+    try:
+        return refresh_prices(path, data)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error refreshing data: {e}")
+        return None
+
+
+def string_date_into_tuple(date_string):
+    """
+    Converts a date in string format (e.g., "2-2-2024" or "2/2/2024") into a tuple (year, month, day).
+    :return: tuple representing the date or None if the date is not valid
+    """
+    try:
+        if "-" in date_string:
+            date_obj = datetime.strptime(date_string, "%d-%m-%Y")
+        else:
+            date_obj = datetime.strptime(date_string, "%m/%d/%Y")
+        return date_obj.year, date_obj.month, date_obj.day
+    except ValueError:
+        print(f"Error parsing date: {date_string}")
+        return None
+
+
+def default_trade_dates(data, stock="Amazon"):
+    """
+    Picks the default dates of a stock, sell on the last available date and buy ten market days before.
+    :return: (buy date, sell date) tuples or None when the stock is not in the dataset
+    """
+    if stock not in data:
+        return None
+    dates = data.available_dates(stock)
+    if not len(dates):
+        return None
+    return to_tuple(dates[max(len(dates) - 10, 0)]), to_tuple(dates[-1])
+
+
+def snap_trade_dates(data, stock, buy_date, sell_date):
+    """
+    Moves the dates of a trade that are not trading days of the stock to the nearest trading day.
+    The dates are (year, month, day) tuples, they are returned as given when they are in the wrong
+    order or the stock is not in the dataset so trade_prices reports the error.
+    :return: (buy date, sell date)
+    """
+    if buy_date > sell_date or stock not in data:
+        return buy_date, sell_date
+    buy = data.nearest_date(stock, buy_date)
+    sell = data.nearest_date(stock, sell_date)
+    if buy is None or sell is None:
+        return buy_date, sell_date
+    return buy, sell
+
+
+def trade_prices(data, stock, buy_date, sell_date):
+    """
+    Looks up the buy and sell prices of a trade, the dates are (year, month, day) tuples.
+    :return: (buy price, sell price)
+    :raise TradeError: when the dates are in the wrong order or a price is not available
+    """
+    if buy_date > sell_date:
+        raise TradeError("Selected buy date is after sell date, impossible calcul")
+    if stock not in data:
+        raise TradeError(f"Stock '{stock}' is not available in the dataset.")
+
+    buy_price = data.price(stock, buy_date)
+    if buy_price is None:
+        raise TradeError(
+            "The selected purchase date does not match our available data."
+        )
+    sell_price = data.price(stock, sell_date)
+    if sell_price is None:
+        raise TradeError("The selected sell date does not match our available data.")
+    return buy_price, sell_price
+
+
+def value_trade(data, stock, buy_date, sell_date, quantity):
+    """
+    Values one trade of quantity shares.
+    :return: (purchase total, sell total, profit)
+    :raise TradeError: when the trade can not be valued
+    """
+    buy_price, sell_price = trade_prices(data, stock, buy_date, sell_date)
+    return value_trades(buy_price, sell_price, quantity)
@@ -0,0 +1,221 @@
+"""
+Streaming ingestion of the stock market CSV file.
+
+The file is read in chunks of rows by the pandas C parser, which also removes
+the thousands separators of the prices whatever their grouping ("5,89,498").
+The dates of a chunk are parsed once per distinct value.
+"""
+
+import csv
+import os
+import time
+
+import numpy as np
+
+from price_store import PriceStore
+
+# Number of rows parsed together
+CHUNK_ROWS = 65536
+
+
+def parse_prices(cells):
+    """
+    Parses a block of price strings such as "5,89,498" or "43,194.70" into floats.
+    Thousands separators are removed whatever their grouping, cells that can not be parsed become NaN.
+    :return: float64 array with the same shape as cells
+    """
+    cells = np.strings.strip(np.asarray(cells, dtype=str))
+    cleaned = np.strings.replace(cells, ",", "")
+    cleaned = np.where(np.strings.str_len(cleaned) == 0, "nan", cleaned)
+    try:
+        return cleaned.astype(np.float64)
+    except ValueError:
+        pass
+
+    # Slow path, only for the columns holding a cell that is not a number
+    values = np.empty(cleaned.shape, dtype=np.float64)
+    for j in range(cleaned.shape[1]):
+        try:
+            values[:, j] = cleaned[:, j].astype(np.float64)
+        except ValueError:
+            for i, cell in enumerate(cleaned[:, j]):
+                try:
+                    values[i, j] = float(cell)
+                except ValueError:
+                    values[i, j] = np.nan
+    return values
+
+
+def parse_date(date_string):
+    """
+    Parses one date written "d-m-Y" or "m/d/Y".
+    :return: (year, month, day) tuple or None if the date is not valid
+    """
+    try:
+        if "-" in date_string:
+            day, month, year = date_string.split("-")
+        else:
+            month, day, year = date_string.split("/")
+        if len(year) != 4:
+            return None
+        return int(year), int(month), int(day)
+    except ValueError:
+        return None
+
+
+def parse_dates(date_strings):
+    """
+    Parses a block of dates, each distinct string is only parsed once.
+    :return: datetime64[D] array, NaT where the date is not valid
+    """
+    unique, inverse = np.unique(
+        np.asarray(date_strings, dtype=str), return_inverse=True
+    )
+    parts = np.array(
+        [parse_date(date_string) or (1970, 0, 0) for date_string in unique],
+        dtype=np.int64,
+    ).reshape(len(unique), 3)
+    years, months, days = parts[:, 0], parts[:, 1], parts[:, 2]
+
+    # Build the days with datetime64 arithmetic and reject impossible dates like 31-02
+    valid = (months >= 1) & (months <= 12) & (days >= 1)
+    first_of_month = (years - 1970) * 12 + np.clip(months, 1, 12) - 1
+    first_of_month = first_of_month.astype("datetime64[M]")
+    month_length = (first_of_month + 1).astype("datetime64[D]") - first_of_month.astype(
+        "datetime64[D]"
+    )
+    valid &= days <= month_length.astype(np.int64)
+    parsed = first_of_month.astype("datetime64[D]") + (days - 1)
+    parsed[~valid] = np.datetime64("NaT")
+
+    for date_string in unique[~valid]:
+        print(f"Error parsing date: {date_string}")
+    return parsed[inverse]
+
+
+def chunk_prices(chunk):
+    """
+    Converts the stock columns of a chunk into a block of floats.
+    Columns that pandas could not read as numbers are parsed again with parse_prices.
+    :return: float64 array of shape (number of rows, number of stocks)
+    """
+    columns = chunk.iloc[:, 1:]
+    prices = np.empty(columns.shape, dtype=np.float64)
+    for j, dtype in enumerate(columns.dtypes):
+        column = columns.iloc[:, j]
+        if dtype == object:
+            prices[:, j] = parse_prices(column.fillna("").to_numpy(str)[:, None])[:, 0]
+        else:
+            prices[:, j] = column.to_numpy(np.float64)
+    return prices
+
+
+def iter_price_chunks(path, date_column, chunk_rows=CHUNK_ROWS):
+    """
+    Reads the stock market CSV file by chunks of chunk_rows rows.
+    date_column is the name of the first column, the one holding the dates.
+    :return: generator of (dates, prices, progress) blocks, progress is the fraction of the file read
+    """
+    # Imported here so loading the dataset from its cache does not pay for pandas
+    import pandas as pd  # type: ignore[import-untyped]
+
+    size = max(os.path.getsize(path), 1)
+    with open(path, mode="rb") as file, pd.read_csv(
+        file,
+        chunksize=chunk_rows,
+        thousands=",",
+        dtype={date_column: str},
+        on_bad_lines="warn",
+    ) as reader:
+        for chunk in reader:
+            dates = chunk[date_column].fillna("").to_numpy(str)
+            yield parse_dates(dates), chunk_prices(chunk), min(file.tell() / size, 1.0)
+
+
+def read_top_rows(path, last_line):
+    """
+    Reads the data rows written at the top of the file since its first data row was last_line.
+    Only the new rows are read, the file is expected to grow by its top.
+    :return: (header, new lines, size of the header and the new lines in bytes),
+    or None when last_line is not found
+    """
+    with open(path, mode="rb") as file:
+        header = file.readline()
+        lines = []
+        for line in iter(file.readline, b""):
+            if line.rstrip(b"\r\n").decode("latin-1") == last_line:
+                return header, lines, len(header) + sum(map(len, lines))
+            lines.append(line)
+    return None
+
+
+def parse_rows(header, lines):
+    """
+    Parses raw lines of the stock market CSV file.
+    Lines without one value per stock are skipped.
+    :return: (dates, prices) block like iter_price_chunks
+    """
+    stock_count = len(next(csv.reader([header.decode()]))) - 1
+    rows = []
+    for row in csv.reader(line.decode() for line in lines):
+        if len(row) != stock_count + 1:
+            print(f"Skipping line with {len(row)} fields: {row}")
+            continue
+        rows.append(row)
+    cells = np.array([row[1:] for row in rows], dtype=str)
+    prices = parse_prices(cells.reshape(len(rows), stock_count))
+    return parse_dates([row[0] for row in rows]), prices
+
+
+def run_steps(steps):
+    """
+    Runs a generator of loading steps to its end.
+    :return: the return value of the generator
+    """
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+
+def read_price_csv(path, chunk_rows=CHUNK_ROWS):
+    """
+    Reads the stock market CSV file chunk by chunk and builds the price store.
+    :return: a PriceStore
+    """
+    return run_steps(read_price_csv_steps(path, chunk_rows))
+
+
+def read_price_csv_steps(path, chunk_rows=CHUNK_ROWS):
+    """
+    Reads the stock market CSV file one chunk per step, so a UI can stay responsive between the chunks.
+    Prints the ingestion throughput in rows per second.
+    :return: generator yielding (fraction of the file read, stocks that got their first price),
+    its return value is the PriceStore
+    """
+    start = time.perf_counter()
+    with open(path, mode="r", newline="") as file:
+        header = next(csv.reader(file))
+    stock_names = header[1:]  # All columns except 'Date' are stock names
+
+    date_blocks = [np.array([], dtype="datetime64[D]")]
+    price_blocks = [np.empty((0, len(stock_names)))]
+    seen = np.zeros(len(stock_names), dtype=bool)
+    for dates, prices, progress in iter_price_chunks(path, header[0], chunk_rows):
+        date_blocks.append(dates)
+        price_blocks.append(prices)
+
+        # Stocks with a first valid price in this chunk
+        new = ~seen & ~np.isnan(prices[~np.isnat(dates)]).all(axis=0)
+        seen |= new
+        yield progress, [stock_names[j] for j in np.flatnonzero(new)]
+    dates = np.concatenate(date_blocks)
+    prices = np.concatenate(price_blocks)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Read {len(dates)} rows in {elapsed:.3f}s "
+        f"({len(dates) / max(elapsed, 1e-9):,.0f} rows/s)."
+    )
+    return PriceStore.from_blocks(stock_names, dates, prices)
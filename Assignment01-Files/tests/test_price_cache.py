@@ -0,0 +1,62 @@
+"""
+Refresh of price stores sharing one cache.
+
+Run from the project folder:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset_generator import generate_dataset  # noqa: E402
+from price_cache import load_prices, refresh_prices  # noqa: E402
+
+
+def add_top_row(path, date):
+    """
+    Writes a new day at the top of the CSV file, after its header, like a daily update.
+    """
+    with open(path, encoding="utf-8") as file:
+        lines = file.readlines()
+    stocks = len(lines[0].split(",")) - 1
+    lines.insert(1, date + "," + ",".join(["1.00"] * stocks) + "\n")
+    with open(path, "w", encoding="utf-8", newline="\n") as file:
+        file.writelines(lines)
+
+
+class RefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "prices.csv")
+        generate_dataset(self.path, tickers=3, days=40, end="2024-12-31")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_unchanged_file_keeps_the_store(self):
+        store = load_prices(self.path)
+        self.assertIs(refresh_prices(self.path, store), store)
+
+    def test_two_stores_one_cache(self):
+        first = load_prices(self.path)  # parses the file and writes the cache
+        second = load_prices(self.path)  # loaded from the cache
+        days = len(first.dates)
+        self.assertEqual(len(second.dates), days)
+
+        add_top_row(self.path, "1/2/2025")
+        first = refresh_prices(self.path, first)  # updates the shared cache
+        self.assertEqual(len(first.dates), days + 1)
+
+        # The cache already describes the file, the second store still has to get the new day
+        second = refresh_prices(self.path, second)
+        self.assertIsNotNone(second)
+        self.assertEqual(len(second.dates), days + 1)
+        self.assertEqual(second.price(first.tickers[0], (2025, 1, 2)), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,8 +11,18 @@ import csv
 import random
 import sys
 
-from PyQt6.QtCore import QPoint, Qt, QTimer
-from PyQt6.QtGui import QAction, QIcon, QPainter, QPen, QPixmap, QPalette, QColor
+from PyQt6.QtCore import QLineF, QPoint, QPointF, QRect, Qt, QTimer
+from PyQt6.QtGui import (
+    QAction,
+    QIcon,
+    QImage,
+    QPainter,
+    QPainterPath,
+    QPen,
+    QPixmap,
+    QPalette,
+    QColor,
+)
 from PyQt6.QtWidgets import (
     QApplication,
     QDockWidget,
@@ -34,6 +44,9 @@ from PyQt6.QtWidgets import (
     QHBoxLayout
 )
 
+from canvas import CANVAS_FORMAT, new_canvas
+from strokes import Clear, Fill, OpenedImage, Stroke, StrokeStore
+
 
 class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidget.html
     """
@@ -60,12 +73,13 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
         )  # documentation: https://doc.qt.io/qt-6/qwidget.html#windowIcon-prop
 
         # image settings (default)
-        self.image = QPixmap(
-            "./icons/canvas.png"
-        )  # documentation: https://doc.qt.io/qt-6/qpixmap.html
-        self.image.fill(
-            Qt.GlobalColor.white
-        )  # documentation: https://doc.qt.io/qt-6/qpixmap.html#fill
+        # the image is a QImage, kept in the memory of the application so saving it and reading its pixels is direct
+        self.image = new_canvas(
+            width, height
+        )  # white canvas, documentation: https://doc.qt.io/qt-6/qimage.html
+        # copy of the image on the display side, only the parts of the image changed since the last paint are copied
+        self.displayPixmap = None  # documentation: https://doc.qt.io/qt-6/qpixmap.html
+        self.displayDirty = QRect()  # part of the image not copied to displayPixmap yet
         mainWidget = QWidget()
         mainWidget.setMaximumWidth(300)
 
@@ -85,10 +99,28 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
             Qt.GlobalColor.black
         )  # documentation: https://doc.qt.io/qt-6/qt.html#GlobalColor-enum
         self.isEraserActive = False  # Track if the eraser is active
+        self.isFillActive = False  # Track if the bucket fill is active
+        # difference of each colour channel still filled by the bucket
+        self.fillTolerance = 32
 
         # reference to last point recorded by mouse
         self.lastPoint = QPoint()  # documentation: https://doc.qt.io/qt-6/qpoint.html
 
+        # stroke session, the painter and the path are kept from the mouse press to the mouse release
+        self.strokePainter = None  # documentation: https://doc.qt.io/qt-6/qpainter.html
+        # documentation: https://doc.qt.io/qt-6/qpainterpath.html
+        self.strokePath = None
+        self.strokeLength = 0.0  # length of the path, so the dashes continue from one segment to the next
+        # transparent image the stroke is drawn on while the mouse moves, it is only drawn on the image on release
+        self.strokeOverlay = None  # documentation: https://doc.qt.io/qt-6/qimage.html
+        self.pen = None  # pen of the brush settings in penSettings, only made again when they change
+        self.penSettings = None
+
+        # vector model of the canvas, the image is drawn again from it on undo and on resize
+        self.strokes = StrokeStore()
+        # points of the stroke being drawn, as fractions of the image size
+        self.currentStroke = None
+
         # Initialize default game settings
         self.draw_time_limit = 30  # Default draw time in seconds
         self.answer_time_limit = 10  # Default answer time in seconds
@@ -120,6 +152,12 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
         restoreBrushAction.triggered.connect(self.restoreBrush)
         restoreBrushAction.setShortcut("Ctrl+R")  # set shortcut for  restor brush
 
+        # Bucket fill option
+        fillAction = QAction(" Fill ", self)
+        self.mainMenu.addAction(fillAction)
+        fillAction.triggered.connect(self.activateFill)
+        fillAction.setShortcut("Ctrl+F")  # set shortcut for the bucket fill
+
         self.brushSizeMenu = self.mainMenu.addMenu(
             " Brush Size "
         )  # add the "Brush Size" menu to the menu bar
@@ -127,6 +165,8 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
             " Brush Colour "
         )  # add the "Brush Colour" menu to the menu barself.capStyle, self.joinStyle
         self.brushStyleMenu = self.mainMenu.addMenu(" Brush Style ")  # adding brush style menu
+        # add the "Edit" menu for undo and redo
+        self.editMenu = self.mainMenu.addMenu(" Edit ")
         game_setting_action = self.mainMenu.addAction(
             " Game Settings "
         )  # add " Game Setting" menu to the menu bar
@@ -174,6 +214,16 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
             self.open
         )  # when the menu option is selected or the shortcut is used the open slot is triggered
 
+        # undo and redo, Ctrl+Y is already the yellow brush so redo is Ctrl+Shift+Z
+        undoAction = QAction("Undo", self)
+        undoAction.setShortcut("Ctrl+Z")
+        self.editMenu.addAction(undoAction)
+        undoAction.triggered.connect(self.undo)
+        redoAction = QAction("Redo", self)
+        redoAction.setShortcut("Ctrl+Shift+Z")
+        self.editMenu.addAction(redoAction)
+        redoAction.triggered.connect(self.redo)
+
         # brush thickness
         threepxAction = QAction("3px", self)
         threepxAction.setShortcut("Ctrl+3")
@@ -285,6 +335,7 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
             f"<b>Instructions:</b><br>"
             f"- Use the left mouse button to draw on the canvas.<br>"
             f"- Use the eraser (Ctrl+E) to erase parts of your drawing.<br>"
+            f"- Use the bucket (Ctrl+F) to fill an area with the brush colour.<br>"
             f"- Select brush size, style, and colour from the menu.<br>"
             f"- Save your drawing by selecting 'Save' (Ctrl+S).<br>"
             f"- Clear the canvas by selecting 'Clear' (Ctrl+C).<br>"
@@ -303,9 +354,11 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
             f"- Change colour: Black (Ctrl+B), Red (Ctrl+R), Green (Ctrl+G), Yellow (Ctrl+Y), Blue (Ctrl+U)"
             f"or choose from the color palette (Ctrl+P).<br>"
             f"- Use the eraser tool: (Ctrl+E) <br>"
-            f"- Restore brush after erasing: (Ctrl+R) <br>"
+            f"- Use the bucket fill tool: (Ctrl+F) <br>"
+            f"- Restore brush after erasing or filling: (Ctrl+R) <br>"
             f"- Creating the leftside dock: (Ctrl+D) <br>"
             f"- Clear the canvas: (Ctrl+C) <br>"
+            f"- Undo: (Ctrl+Z), redo: (Ctrl+Shift+Z) <br>"
             f"- Save the canvas: (Ctrl+S) <br><br>"
             f"<br><i>Enjoy playing!</i>"
         )
@@ -410,7 +463,7 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
         self.dockInfo.setPalette(palette)
         
         # Apply the palette to all menus
-        for menu in [self.mainMenu, self.helpMenu, self.fileMenu, self.brushStyleMenu, self.capStyleMenu, self.joinStyleMenu, self.lineStyleMenu, self.brushColorMenu]:
+        for menu in [self.mainMenu, self.helpMenu, self.fileMenu, self.brushStyleMenu, self.editMenu, self.capStyleMenu, self.joinStyleMenu, self.lineStyleMenu, self.brushColorMenu]:
             menu.setPalette(palette)
             # Additional styling with stylesheets to ensure color consistency across menus
             menu.setStyleSheet("""
@@ -439,42 +492,68 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
                 event.pos()
             )  # Save the location of the mouse press as the lastPoint
             print(self.lastPoint)  # Print the lastPoint for debugging purposes
+            if self.allowDrawing and self.isFillActive:
+                self.fill(self.lastPoint)
+            elif self.allowDrawing:
+                self.beginStroke()
 
     def mouseMoveEvent(
         self, event
     ):  # when the mouse is moved, documenation: documentation: https://doc.qt.io/qt-6/qwidget.html#mouseMoveEvent
-        if self.drawing & self.allowDrawing:
-
-            painter = QPainter(
-                self.image
-            )  # object which allows drawing to take place on an image
-            # allows the selection of brush colour, brish size, line type, cap type, join type. Images available here http://doc.qt.io/qt-6/qpen.html
-
-            # Set eraser mode if eraser is active
-            if self.isEraserActive:
-                # Eraser mode
-                painter.setPen(
-                    QPen(Qt.GlobalColor.white, self.brushSize, Qt.PenStyle.SolidLine) # eraser is white because the font when playing the game is white
-                )
-            else:
-                # Normal drawing mode
-                painter.setPen(
-                    QPen(
-                        self.brushColor,
-                        self.brushSize,
-                        self.brushStyle,
-                        self.capStyle,
-                        self.joinStyle,
-                    )
-                )
+        if self.drawing & self.allowDrawing and self.strokePainter is not None:
+
+            # the dashes continue from the end of the previous segment, the offset is in pen widths
+            # setting an offset turns the pen into a custom dash line, so solid pens are left as they are
+            if self.penSettings[2] != Qt.PenStyle.SolidLine:
+                self.pen.setDashOffset(
+                    self.strokeLength / max(self.pen.widthF(), 1)
+                )  # documentation: https://doc.qt.io/qt-6/qpen.html#setDashOffset
+                self.strokePainter.setPen(self.pen)
+            self.strokePath.lineTo(
+                QPointF(event.pos())
+            )  # documentation: https://doc.qt.io/qt-6/qpainterpath.html#lineTo
+            self.currentStroke.add_point(
+                event.pos().x() / self.image.width(),
+                event.pos().y() / self.image.height(),
+            )
+            self.strokeLength += QLineF(
+                QPointF(self.lastPoint), QPointF(event.pos())
+            ).length()  # documentation: https://doc.qt.io/qt-6/qlinef.html#length
 
-            painter.drawLine(
+            self.strokePainter.drawLine(
                 self.lastPoint, event.pos()
             )  # draw a line from the point of the orginal press to the point to where the mouse was dragged to
+            # only repaint the area of the new segment, the updates requested before the next paint are merged by Qt into one paintEvent
+            # the image did not change, the segment is on the overlay
+            self.update(
+                self.segmentRect(self.lastPoint, event.pos())
+            )  # documentation: https://doc.qt.io/qt-6/qwidget.html#update-1
             self.lastPoint = (
                 event.pos()
             )  # set the last point to refer to the point we have just moved to, this helps when drawing the next line segment
-            self.update()  # call the update method of the widget which calls the paintEvent of this class
+
+    def segmentRect(self, start, end):
+        """
+        Bounding rect of a segment drawn with the brush, padded by the pen width so the caps are included
+        """
+        # the pen width covers the round caps and the corners of the square caps, plus the antialiasing
+        padding = self.brushSize + 2
+        return (
+            QRect(start, end)
+            .normalized()
+            .adjusted(-padding, -padding, padding, padding)
+        )  # documentation: https://doc.qt.io/qt-6/qrect.html#adjusted
+
+    def invalidate(self, rect=None):
+        """
+        Marks a part of the image as changed, the whole image by default, and repaints it
+        """
+        if rect is None:
+            rect = self.image.rect()
+        self.displayDirty = self.displayDirty.united(
+            rect
+        )  # documentation: https://doc.qt.io/qt-6/qrect.html#united
+        self.update(rect)  # documentation: https://doc.qt.io/qt-6/qwidget.html#update-1
 
     def mouseReleaseEvent(
         self, event
@@ -483,6 +562,82 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
             event.button() == Qt.MouseButton.LeftButton
         ):  # if the released button is the left button, documentation: https://doc.qt.io/qt-6/qt.html#MouseButton-enum ,
             self.drawing = False  # exit drawing mode
+            self.endStroke()
+
+    def currentPen(self):
+        """
+        Pen of the current brush settings, the pen is only made again when a setting changed
+        """
+        if self.isEraserActive:
+            # eraser is white because the font when playing the game is white
+            settings = (Qt.GlobalColor.white, self.brushSize, Qt.PenStyle.SolidLine)
+        else:
+            settings = (
+                self.brushColor,
+                self.brushSize,
+                self.brushStyle,
+                self.capStyle,
+                self.joinStyle,
+            )
+        if settings != self.penSettings:
+            self.penSettings = settings
+            # documentation: https://doc.qt.io/qt-6/qpen.html
+            self.pen = QPen(*settings)
+        return self.pen
+
+    def beginStroke(self):
+        """
+        Opens the stroke session: one painter on the overlay and one path for the whole stroke
+        """
+        self.endStroke()
+        if self.strokeOverlay is None or self.strokeOverlay.size() != self.image.size():
+            # the overlay is kept for the next strokes, only the part a stroke touched is cleared
+            self.strokeOverlay = QImage(self.image.size(), CANVAS_FORMAT)
+            self.strokeOverlay.fill(Qt.GlobalColor.transparent)
+        self.strokePath = QPainterPath(QPointF(self.lastPoint))
+        self.strokeLength = 0.0
+        self.strokePainter = QPainter(self.strokeOverlay)
+        self.strokePainter.setPen(self.currentPen())
+        self.currentStroke = Stroke(self.pen)
+        self.currentStroke.add_point(
+            self.lastPoint.x() / self.image.width(),
+            self.lastPoint.y() / self.image.height(),
+        )
+
+    def endStroke(self):
+        """
+        Closes the stroke session, the stroke is drawn on the image as one path so the joins and the dashes are right
+        """
+        if self.strokePainter is None:
+            return
+        if self.strokePath.elementCount() > 1:
+            rect = self.strokePath.boundingRect().toAlignedRect()
+            rect = self.segmentRect(rect.topLeft(), rect.bottomRight())
+            # clear the segments from the overlay
+            self.strokePainter.setCompositionMode(
+                QPainter.CompositionMode.CompositionMode_Clear
+            )  # documentation: https://doc.qt.io/qt-6/qpainter.html#CompositionMode-enum
+            self.strokePainter.fillRect(rect, Qt.GlobalColor.transparent)
+            self.strokePainter.end()
+
+            # draw the whole path on the image
+            if self.penSettings[2] != Qt.PenStyle.SolidLine:
+                self.pen.setDashOffset(0)
+            imagePainter = QPainter(self.image)
+            imagePainter.setPen(self.pen)
+            imagePainter.drawPath(
+                self.strokePath
+            )  # documentation: https://doc.qt.io/qt-6/qpainter.html#drawPath
+            imagePainter.end()
+            self.invalidate(rect)
+        else:
+            self.strokePainter.end()
+        if len(self.currentStroke) > 1:
+            # the image is kept as a checkpoint every few strokes
+            self.strokes.add(self.currentStroke, self.image)
+        self.strokePainter = None
+        self.strokePath = None
+        self.currentStroke = None
 
     # paint events
     def paintEvent(self, event):
@@ -490,13 +645,31 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
         canvasPainter = QPainter(
             self
         )  # create a new QPainter object, documentation: https://doc.qt.io/qt-6/qpainter.html
+        if self.displayPixmap is None or self.displayPixmap.size() != self.image.size():
+            self.displayPixmap = QPixmap.fromImage(
+                self.image
+            )  # documentation: https://doc.qt.io/qt-6/qpixmap.html#fromImage
+        elif not self.displayDirty.isEmpty():
+            # copy the changed part of the image to the display pixmap
+            pixmapPainter = QPainter(self.displayPixmap)
+            pixmapPainter.drawImage(
+                self.displayDirty, self.image, self.displayDirty
+            )  # documentation: https://doc.qt.io/qt-6/qpainter.html#drawImage
+            pixmapPainter.end()
+        self.displayDirty = QRect()
         canvasPainter.drawPixmap(
-            QPoint(), self.image
-        )  # draw the image , documentation: https://doc.qt.io/qt-6/qpainter.html#drawImage-1
+            event.rect(), self.displayPixmap, event.rect()
+        )  # only draw the part of the image that needs repainting, documentation: https://doc.qt.io/qt-6/qpainter.html#drawPixmap
+        if self.strokePainter is not None:
+            # the stroke being drawn is over the image
+            canvasPainter.drawImage(event.rect(), self.strokeOverlay, event.rect())
 
     # resize event - this function is called
     def resizeEvent(self, event):
-        self.image = self.image.scaled(self.width(), self.height())
+        self.endStroke()
+        # the strokes are drawn again at the new size instead of stretching the pixels
+        self.image = self.strokes.render(self.width(), self.height())
+        self.invalidate()
         self.playerInfo.setMaximumSize(150, self.height())
         super().resizeEvent(event)
 
@@ -554,10 +727,38 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
     # Function to activate the eraser
     def activateEraser(self):
         self.isEraserActive = True
+        self.isFillActive = False
 
     # Function to activate brush
     def restoreBrush(self):
         self.isEraserActive = False
+        self.isFillActive = False
+
+    # Function to activate bucket fill
+    def activateFill(self):
+        self.isEraserActive = False
+        self.isFillActive = True
+
+    def fill(self, point):
+        """
+        Fills the area around point with the brush colour, only the filled area is repainted
+        """
+        self.endStroke()
+        width, height = self.image.width(), self.image.height()
+        # the centre of the pixel, so the same pixel is filled when the canvas is drawn again at this size
+        operation = Fill(
+            (point.x() + 0.5) / width,
+            (point.y() + 0.5) / height,
+            self.brushColor,
+            self.fillTolerance,
+        )
+        painter = QPainter(self.image)
+        rect = operation.render(painter, width, height)
+        painter.end()
+        if rect is not None:
+            # a fill can be undone like a stroke
+            self.strokes.add(operation, self.image)
+            self.invalidate(rect)
 
     # slots
     def save(self):
@@ -570,10 +771,33 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
         self.image.save(filePath + end)  # save file image to the file path
 
     def clear(self):
+        self.endStroke()  # the image can not be filled while a stroke paints on it
         self.image.fill(
             Qt.GlobalColor.white
         )  # fill the image with white, documentation: https://doc.qt.io/qt-6/qimage.html#fill-2
-        self.update()  # call the update method of the widget which calls the paintEvent of this class
+        self.strokes.add(Clear(), self.image)  # a clear can be undone like a stroke
+        self.invalidate()  # call the update method of the widget which calls the paintEvent of this class
+
+    def undo(self):
+        """
+        Removes the last stroke, clear or opened image and draws the canvas again from the last checkpoint
+        """
+        if not self.allowDrawing:
+            return
+        self.endStroke()
+        if self.strokes.undo():
+            self.image = self.strokes.render(self.image.width(), self.image.height())
+            self.invalidate()
+
+    def redo(self):
+        """
+        Draws again the last operation undone
+        """
+        if not self.allowDrawing:
+            return
+        self.endStroke()
+        if self.strokes.redo(self.image):
+            self.invalidate()
 
     def threepx(self):  # the brush size is set to 3
         self.brushSize = 3
@@ -635,15 +859,18 @@ class PictionaryGame(QMainWindow):  # documentation https://doc.qt.io/qt-6/qwidg
             return
         with open(filePath, "rb") as f:  # open the file in binary mode for reading
             content = f.read()  # read the file
-        self.image.loadFromData(content)  # load the data into the file
-        width = self.width()  # get the width of the current QImage in your application
-        height = (
-            self.height()
-        )  # get the height of the current QImage in your application
-        self.image = self.image.scaled(
-            width, height
-        )  # scale the image from file and put it in your QImage
-        self.update()  # call the update method of the widget which calls the paintEvent of this class
+        self.endStroke()
+        image = QImage()
+        image.loadFromData(content)  # load the data into the file
+        # the opened image is kept at its own size and stretched over the canvas when drawn
+        openedImage = OpenedImage(image)
+        painter = QPainter(self.image)
+        openedImage.render(
+            painter, self.image.width(), self.image.height()
+        )  # draw the image from file on the canvas
+        painter.end()
+        self.strokes.add(openedImage, self.image)
+        self.invalidate()  # call the update method of the widget which calls the paintEvent of this class
 
     def update_game_setting(self):
         # Check if the game is active
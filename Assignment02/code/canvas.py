@@ -0,0 +1,156 @@
+"""
+Raster canvas of the Pictionary game.
+
+The canvas is a QImage in Format_ARGB32_Premultiplied, the format QPainter
+draws the fastest into. It lives in the memory of the application, so saving
+it and reading its pixels need no round trip to the display server: pixels
+gives a NumPy view of its memory without copying it.
+
+flood_fill finds the region of a bucket fill on the runs of matching pixels of
+each row. The runs are found once for the whole canvas with NumPy, the runs of
+the next row touching each one by binary search, and the runs connected to the
+one under the cursor are labelled with a union-find done on whole arrays. The
+Python loops run a few times per fill, never once per run or per pixel, so a
+canvas cut in many small runs fills as fast as a blank one.
+"""
+
+import numpy as np
+from PyQt6.QtCore import QRect, Qt
+from PyQt6.QtGui import QImage
+
+# Format of the canvas, one 0xAARRGGBB uint32 per pixel
+CANVAS_FORMAT = QImage.Format.Format_ARGB32_Premultiplied
+
+
+def new_canvas(width, height):
+    """
+    :return: a white canvas of width x height pixels
+    """
+    image = QImage(
+        max(width, 1), max(height, 1), CANVAS_FORMAT
+    )  # documentation: https://doc.qt.io/qt-6/qimage.html
+    image.fill(Qt.GlobalColor.white)
+    return image
+
+
+def pixels(image, readonly=False):
+    """
+    View of the pixels of a canvas, without copying them. Writing to the array changes the
+    image, which has to be kept alive while the array is used. A readonly view can be taken
+    while a QPainter paints on the image.
+    :return: uint32 array of shape (height, width), 0xAARRGGBB values
+    """
+    if readonly:
+        data = image.constBits()  # does not detach the image from the painter
+    else:
+        data = image.bits()  # documentation: https://doc.qt.io/qt-6/qimage.html#bits
+    data.setsize(image.sizeInBytes())
+    rows = np.frombuffer(data, np.uint32).reshape(
+        image.height(), image.bytesPerLine() // 4
+    )
+    return rows[:, : image.width()]
+
+
+def matching(view, x, y, tolerance):
+    """
+    Pixels whose channels each differ from the pixel at (x, y) by at most tolerance.
+    :return: boolean array of the shape of view
+    """
+    if tolerance <= 0:
+        return view == view[y, x]
+    height, width = view.shape
+    color = view[y : y + 1, x : x + 1].view(np.uint8).reshape(4).astype(np.int16)
+    low = np.maximum(color - tolerance, 0)
+    size = np.minimum(color + tolerance, 255) - low
+    # the channels below low wrap around to large values, so one comparison checks both bounds
+    channels = view.view(np.uint8).reshape(height, width * 4)
+    inside = (channels - np.tile(low.astype(np.uint8), width)) <= np.tile(
+        size.astype(np.uint8), width
+    )
+    # the 4 flags of a pixel read as one uint32 are all set when every channel is inside
+    return inside.view(np.uint32) == 0x01010101
+
+
+def runs(match):
+    """
+    Runs of True values of each row of match, in row order then x order. The runs are given as
+    flat positions in a grid of width + 1 columns, so a run never reaches the next row.
+    :return: (starts, ends) int64 arrays, ends is the position after the last pixel of a run
+    """
+    height, width = match.shape
+    padded = np.zeros((height, width + 2), np.int8)
+    padded[:, 1:-1] = match
+    # a run starts and ends where the padded row changes, the changes come in pairs
+    edges = np.flatnonzero(np.diff(padded, axis=1))
+    return edges[0::2], edges[1::2]
+
+
+def components(first, second, count):
+    """
+    Connected components of a graph of count nodes with an edge between first[i] and second[i].
+    Each round links the root of every edge to the smallest root it touches, then points every
+    node straight to its root, so the number of roots of a component at least halves per round.
+    :return: int array, the smallest node of the component of each node
+    """
+    labels = np.arange(count)
+    while len(first):
+        a, b = labels[first], labels[second]
+        linked = a != b
+        first, second, a, b = first[linked], second[linked], a[linked], b[linked]
+        np.minimum.at(labels, np.maximum(a, b), np.minimum(a, b))
+        while True:
+            roots = labels[labels]
+            if np.array_equal(roots, labels):
+                break
+            labels = roots
+    return labels
+
+
+def flood_fill(view, x, y, tolerance=0):
+    """
+    Region of a bucket fill from (x, y): the pixels connected to it, up, down, left or right,
+    that match its colour within tolerance.
+    :return: (rect, mask) the bounding QRect of the region and a boolean array of its size,
+             True for the pixels of the region, or None when (x, y) is outside view
+    """
+    height, width = view.shape
+    if not (0 <= x < width and 0 <= y < height):
+        return None
+    starts, ends = runs(matching(view, x, y, tolerance))
+    stride = width + 1
+
+    # the runs of the next row overlapping each run, found by binary search for every run at once
+    first = np.searchsorted(ends, starts + stride, side="right")
+    last = np.searchsorted(starts, ends + stride, side="left")
+    counts = np.maximum(last - first, 0)
+    upper = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    lower = np.repeat(first, counts) + offsets
+
+    # the region is the component of the run holding (x, y)
+    labels = components(upper, lower, len(starts))
+    seed = np.searchsorted(ends, y * stride + x, side="right")
+    region = np.flatnonzero(labels == labels[seed])
+
+    # the mask is the running sum of +1 at the start and -1 at the end of each run of the region
+    edges = np.zeros(height * stride, np.int8)
+    edges[starts[region]] = 1
+    edges[ends[region]] = -1
+    mask = np.cumsum(edges, dtype=np.int8).reshape(height, stride) > 0
+    rows = starts[region] // stride
+    top, bottom = int(rows.min()), int(rows.max())
+    left = int((starts[region] - rows * stride).min())
+    right = int((ends[region] - rows * stride).max()) - 1
+    rect = QRect(left, top, right - left + 1, bottom - top + 1)
+    return rect, mask[top : bottom + 1, left : right + 1]
+
+
+def fill_image(mask, color):
+    """
+    Image of a filled region, color where mask is True and transparent elsewhere.
+    :return: QImage of the size of mask
+    """
+    height, width = mask.shape
+    data = np.where(mask, np.uint32(color), np.uint32(0))
+    image = QImage(data.data, width, height, width * 4, CANVAS_FORMAT)
+    return image.copy()  # the QImage does not own data
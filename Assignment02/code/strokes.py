@@ -0,0 +1,224 @@
+"""
+Vector model of the Pictionary canvas.
+
+Every change of the canvas is kept as an operation: a stroke, a bucket fill,
+a clear or an opened image. A stroke stores its points in an array('f') of x, y pairs, as
+fractions of the canvas size, and the attributes of its pen, so the canvas can
+be drawn again at any size without resampling pixels. The raster canvas is a
+cache of the operations, with a checkpoint of it every few operations so an
+undo only draws again the operations done since the last checkpoint. The
+checkpoints only hold for one size: a resize draws again every operation since
+the last clear and takes new checkpoints on the way.
+"""
+
+from array import array
+
+from PyQt6.QtCore import QPointF, QRect, Qt
+from PyQt6.QtGui import QColor, QPainter, QPainterPath, QPen
+
+from canvas import fill_image, flood_fill, new_canvas, pixels
+
+# A copy of the canvas is kept every CHECKPOINT_INTERVAL operations, at most MAX_CHECKPOINTS of them
+CHECKPOINT_INTERVAL = 16
+MAX_CHECKPOINTS = 8
+
+
+class Stroke:
+    """
+    A line drawn with the brush, from the mouse press to the mouse release
+    """
+
+    __slots__ = ("points", "color", "width", "style", "cap", "join")
+
+    def __init__(self, pen):
+        self.points = array("f")  # x, y pairs as fractions of the canvas size
+        self.color = QColor(pen.color()).rgba()
+        self.width = pen.widthF()
+        self.style = pen.style()
+        self.cap = pen.capStyle()
+        self.join = pen.joinStyle()
+
+    def __len__(self):
+        return len(self.points) // 2
+
+    def add_point(self, x, y):
+        self.points.append(x)
+        self.points.append(y)
+
+    def pen(self):
+        """
+        Pen the stroke was drawn with
+        """
+        return QPen(
+            QColor.fromRgba(self.color), self.width, self.style, self.cap, self.join
+        )
+
+    def path(self, width, height):
+        """
+        Path of the stroke on a canvas of width x height pixels
+        """
+        points = self.points
+        path = QPainterPath(QPointF(points[0] * width, points[1] * height))
+        for i in range(2, len(points), 2):
+            path.lineTo(points[i] * width, points[i + 1] * height)
+        return path
+
+    def render(self, painter, width, height):
+        if len(self) < 2:
+            return  # a click without a move draws nothing
+        painter.setPen(self.pen())
+        painter.drawPath(self.path(width, height))
+
+
+class Fill:
+    """
+    A region filled with the bucket, from a point given as fractions of the canvas size
+    """
+
+    __slots__ = ("x", "y", "color", "tolerance")
+
+    def __init__(self, x, y, color, tolerance):
+        self.x = x
+        self.y = y
+        self.color = QColor(color).rgba()
+        self.tolerance = tolerance
+
+    def render(self, painter, width, height):
+        """
+        Fills the region around the point on the canvas the painter paints on
+        :return: the bounding QRect of the region filled, or None
+        """
+        canvas = painter.device()
+        found = flood_fill(
+            pixels(canvas, readonly=True),
+            min(int(self.x * width), width - 1),
+            min(int(self.y * height), height - 1),
+            self.tolerance,
+        )
+        if found is None:
+            return None
+        rect, mask = found
+        painter.drawImage(rect.topLeft(), fill_image(mask, self.color))
+        return rect
+
+
+class Clear:
+    """
+    The canvas filled with white
+    """
+
+    def render(self, painter, width, height):
+        painter.fillRect(QRect(0, 0, width, height), Qt.GlobalColor.white)
+
+
+class OpenedImage:
+    """
+    An image opened from a file, stretched over the canvas
+    """
+
+    def __init__(self, image):
+        self.image = image  # kept at its own size, only scaled when drawn
+
+    def render(self, painter, width, height):
+        painter.drawImage(QRect(0, 0, width, height), self.image)
+
+
+class StrokeStore:
+    """
+    Operations done on the canvas with their undo and redo stacks and the raster checkpoints
+    """
+
+    def __init__(self):
+        self.operations = []
+        self.redoStack = []
+        self.checkpoints = {}  # number of operations drawn -> copy of the canvas
+        self.checkpointSize = None
+
+    def add(self, operation, canvas):
+        """
+        Adds an operation already drawn on canvas, the operations undone can not be redone anymore
+        """
+        self.operations.append(operation)
+        self.redoStack.clear()
+        self.checkpoint(canvas)
+
+    def checkpoint(self, canvas):
+        """
+        Keeps a copy of the canvas when the number of operations is a multiple of CHECKPOINT_INTERVAL
+        """
+        size = (canvas.width(), canvas.height())
+        if size != self.checkpointSize:
+            # checkpoints of another size can not be used
+            self.checkpoints = {}
+            self.checkpointSize = size
+        count = len(self.operations)
+        if count % CHECKPOINT_INTERVAL == 0 and count not in self.checkpoints:
+            self.checkpoints[count] = canvas.copy()
+            while len(self.checkpoints) > MAX_CHECKPOINTS:
+                del self.checkpoints[min(self.checkpoints)]
+
+    def undo(self):
+        """
+        Removes the last operation, the canvas has to be drawn again with render
+        :return: True if there was an operation to undo
+        """
+        if not self.operations:
+            return False
+        self.redoStack.append(self.operations.pop())
+        count = len(self.operations)
+        self.checkpoints = {i: c for i, c in self.checkpoints.items() if i <= count}
+        return True
+
+    def redo(self, canvas):
+        """
+        Draws again on canvas the last operation undone
+        :return: True if there was an operation to redo
+        """
+        if not self.redoStack:
+            return False
+        operation = self.redoStack.pop()
+        painter = QPainter(canvas)
+        operation.render(painter, canvas.width(), canvas.height())
+        painter.end()
+        self.operations.append(operation)
+        self.checkpoint(canvas)
+        return True
+
+    def render(self, width, height):
+        """
+        Draws the operations on a new canvas of width x height pixels, starting from the last
+        checkpoint or the last clear. On a new size every checkpoint is dropped, so the whole
+        history since the last clear is drawn again, and the checkpoints are taken again at the
+        new size while drawing, so the undos after a resize start from them.
+        :return: the canvas as a QImage
+        """
+        if (width, height) != self.checkpointSize:
+            # the old checkpoints are stretched pixels at this size, they are rebuilt below
+            self.checkpoints = {}
+            self.checkpointSize = (width, height)
+        count = len(self.operations)
+
+        start = max([i for i in self.checkpoints if i <= count], default=0)
+        clears = [
+            i + 1 for i in range(start, count) if isinstance(self.operations[i], Clear)
+        ]
+        if clears:
+            start = clears[-1]
+        if start in self.checkpoints:
+            canvas = self.checkpoints[start].copy()
+        else:
+            canvas = new_canvas(width, height)
+
+        painter = QPainter(canvas)
+        for i in range(start, count):
+            self.operations[i].render(painter, width, height)
+            if (i + 1) % CHECKPOINT_INTERVAL == 0 and i + 1 not in self.checkpoints:
+                # also rebuilds the checkpoints dropped by a resize,
+                # the canvas is copied without a painter on it
+                painter.end()
+                self.checkpoints[i + 1] = canvas.copy()
+                painter.begin(canvas)
+        painter.end()
+        while len(self.checkpoints) > MAX_CHECKPOINTS:
+            del self.checkpoints[min(self.checkpoints)]
+        return canvas
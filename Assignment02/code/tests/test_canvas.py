@@ -0,0 +1,113 @@
+"""
+Bucket fill on blank and fragmented canvases.
+
+Run from the code folder:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import time
+import unittest
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from canvas import flood_fill  # noqa: E402
+
+WHITE = 0xFFFFFFFF
+BLACK = 0xFF000000
+
+
+def blank(width, height):
+    return np.full((height, width), WHITE, np.uint32)
+
+
+def comb(width, height):
+    """
+    Black teeth one pixel apart joined by a white row at the bottom, one white run per tooth gap
+    """
+    view = blank(width, height)
+    view[:-1, 1::2] = BLACK
+    return view
+
+
+def fence(width, height):
+    """
+    Black bars open at the bottom and the top in turn, the white pixels make a single long path
+    """
+    view = blank(width, height)
+    view[1:, 1::4] = BLACK
+    view[:-1, 3::4] = BLACK
+    return view
+
+
+def noise(width, height):
+    """
+    Black pixels scattered at random, many small regions
+    """
+    dark = np.random.default_rng(1).random((height, width)) < 0.4
+    return np.where(dark, BLACK, WHITE).astype(np.uint32)
+
+
+def reference_fill(view, x, y):
+    """
+    Region of the same colour as (x, y), filled one pixel at a time.
+    :return: boolean array of the shape of view
+    """
+    height, width = view.shape
+    region = np.zeros(view.shape, bool)
+    region[y, x] = True
+    queue = deque([(x, y)])
+    while queue:
+        x, y = queue.popleft()
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if 0 <= nx < width and 0 <= ny < height and not region[ny, nx]:
+                if view[ny, nx] == view[y, x]:
+                    region[ny, nx] = True
+                    queue.append((nx, ny))
+    return region
+
+
+def full_mask(view, x, y):
+    """
+    :return: the mask of flood_fill placed on an array of the shape of view
+    """
+    rect, mask = flood_fill(view, x, y)
+    region = np.zeros(view.shape, bool)
+    region[
+        rect.top() : rect.top() + rect.height(),
+        rect.left() : rect.left() + rect.width(),
+    ] = mask
+    return region
+
+
+class FloodFillTest(unittest.TestCase):
+    def test_outside(self):
+        self.assertIsNone(flood_fill(blank(4, 3), 4, 0))
+
+    def test_same_region_as_a_pixel_fill(self):
+        for make in (blank, comb, fence, noise):
+            view = make(61, 40)
+            for x, y in ((0, 39), (1, 0), (30, 20), (60, 39), (33, 5)):
+                with self.subTest(canvas=make.__name__, x=x, y=y):
+                    np.testing.assert_array_equal(
+                        full_mask(view, x, y), reference_fill(view, x, y)
+                    )
+
+    def test_fragmented_canvas_fills_fast(self):
+        # one Python step per run took seconds on these canvases of 240000 runs
+        for make in (comb, fence):
+            view = make(800, 600)
+            start = time.perf_counter()
+            rect, mask = flood_fill(view, 0, 599)
+            elapsed = time.perf_counter() - start
+            with self.subTest(canvas=make.__name__):
+                self.assertEqual(int(mask.sum()), int((view == WHITE).sum()))
+                self.assertLess(elapsed, 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()